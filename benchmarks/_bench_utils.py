@@ -0,0 +1,73 @@
+"""Shared helpers for the benchmark scripts. Run the scripts from the repository root, e.g.:
+    python benchmarks/bench_scandir_walk.py
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from PyPathTree import SimpleHost, PathTree  # noqa: E402
+
+
+class BenchHost(SimpleHost):
+    """SimpleHost with the system settings that list_cpaths() reads"""
+    def __init__(self, root_path, path_tree, configs=None):
+        super().__init__(root_path, path_tree)
+        self.system_settings = {'configs': configs or {}}
+
+
+def make_path_tree(root, fs=None, configs=None):
+    path_tree = PathTree(BenchHost(root, None, configs))
+    if fs is not None:
+        path_tree.__set_fs__(fs)
+    return path_tree
+
+
+def make_tree(root, dirs_per_level=8, files_per_dir=20, levels=3, file_size=0):
+    """Creates a synthetic tree and returns the number of files created"""
+    count = 0
+    data = b'x' * file_size
+    frontier = [root]
+    for _ in range(levels):
+        next_frontier = []
+        for d in frontier:
+            for i in range(files_per_dir):
+                with open(os.path.join(d, f'file-{i}.md'), 'wb') as f:
+                    f.write(data)
+                count += 1
+            for i in range(dirs_per_level):
+                sub = os.path.join(d, f'dir-{i}')
+                os.mkdir(sub)
+                next_frontier.append(sub)
+        frontier = next_frontier
+    return count
+
+
+class temp_tree:
+    """Context manager that creates a synthetic tree in a temporary directory"""
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.root = None
+        self.file_count = 0
+
+    def __enter__(self):
+        self.root = tempfile.mkdtemp(prefix='pypathtree-bench-')
+        self.file_count = make_tree(self.root, **self.kwargs)
+        return self
+
+    def __exit__(self, *exc):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def best_of(fn, repeat=5):
+    """Returns the best wall time of `repeat` runs and the result of the last run"""
+    best = float('inf')
+    res = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        res = fn()
+        best = min(best, time.perf_counter() - t)
+    return best, res
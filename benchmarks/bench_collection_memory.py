@@ -0,0 +1,74 @@
+"""
+Memory of a walk result on a synthetic tree of 1M paths (no files are created): a list of _CPath objects against a
+CPathCollection of the same paths, and the time of a few filters on the collection.
+    python benchmarks/bench_collection_memory.py [path count]
+"""
+import gc
+import sys
+import itertools
+import time
+import tempfile
+import tracemalloc
+from _bench_utils import make_path_tree
+from PyPathTree import CPathCollection
+
+DIRS = (100, 100)
+EXTENSIONS = ('md', 'txt', 'html', 'png')
+
+
+def synthetic_cpaths(path_tree, count):
+    """count paths: two levels of directories with files spread over them"""
+    return itertools.islice(_synthetic_cpaths(path_tree, max(1, count // (DIRS[0] * DIRS[1]))), count)
+
+
+def _synthetic_cpaths(path_tree, per_dir):
+    for i in range(DIRS[0]):
+        top = f'section-{i}'
+        yield path_tree.create_cpath((top, ), is_file=False)
+        for j in range(DIRS[1]):
+            sub = f'chapter-{j}'
+            yield path_tree.create_cpath((top, sub), is_file=False)
+            for k in range(per_dir):
+                yield path_tree.create_cpath((top, sub, f'page-{k}.{EXTENSIONS[k % len(EXTENSIONS)]}'), is_file=True)
+
+
+def measure(fn):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    res = fn()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, res
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    path_tree = make_path_tree(tempfile.gettempdir())
+    # no interning, like a walk of a tree larger than the cache
+    path_tree = type(path_tree)(path_tree.host, cpath_cache_size=0)
+
+    list_size, cpaths = measure(lambda: list(synthetic_cpaths(path_tree, count)))
+    n = len(cpaths)
+    del cpaths
+    collection_size, collection = measure(lambda: CPathCollection.from_cpaths(path_tree,
+                                                                              synthetic_cpaths(path_tree, count)))
+    print(f'{n} paths')
+    print(f'list of _CPath:   {list_size / 2 ** 20:8.1f} MiB  {list_size / n:6.1f} bytes/path')
+    print(f'CPathCollection:  {collection_size / 2 ** 20:8.1f} MiB  {collection_size / n:6.1f} bytes/path '
+          f'({list_size / collection_size:.1f}x smaller)')
+
+    for name, fn in (('files()', lambda: collection.files()),
+                     ('with_extension(md)', lambda: collection.with_extension('md')),
+                     ('with_depth(3, 3)', lambda: collection.with_depth(3, 3)),
+                     ('under(section-7)', lambda: collection.under('section-7')),
+                     ('sorted(name)', lambda: collection.sorted('name')),
+                     ('sorted(path)', lambda: collection.sorted('path'))):
+        t = time.perf_counter()
+        res = fn()
+        print(f'{name:<20} {time.perf_counter() - t:8.3f} s  {len(res)} paths')
+
+
+if __name__ == '__main__':
+    main()
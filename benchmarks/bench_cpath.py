@@ -0,0 +1,51 @@
+"""
+Memory per _CPath and latency of its derived properties.
+Paths are created with the interning cache disabled so that every path is a separate object.
+"""
+import gc
+import timeit
+import tempfile
+import tracemalloc
+from _bench_utils import make_path_tree
+
+COUNT = 100000
+PROPERTIES = ('relative_path', 'abs_path', 'basename', 'extension', 'id', 'path_comps', 'cpath_comps')
+
+
+def measure_memory(path_tree):
+    comps = [('content', f'dir-{i % 100}', f'file-{i}.md') for i in range(COUNT)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    cpaths = [path_tree.create_cpath(c, is_file=True) for c in comps]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return size / len(cpaths), cpaths
+
+
+def main():
+    root = tempfile.gettempdir()
+    path_tree = make_path_tree(root)
+    path_tree = type(path_tree)(path_tree.host, cpath_cache_size=0)
+
+    per_path, cpaths = measure_memory(path_tree)
+    print(f'memory per cpath (with its comps tuples): {per_path:.0f} bytes')
+
+    # first access over COUNT fresh cpaths against a second pass over the same ones (cached by then), both timed the
+    # same way so that the loop costs the same in either
+    comps = [cpath.path_comps for cpath in cpaths]
+    for name in PROPERTIES:
+        fresh = [path_tree.create_cpath(c, is_file=True) for c in comps]
+        stmt = f'for cpath in fresh: cpath.{name}'
+        first = timeit.timeit(stmt, globals={'fresh': fresh}, number=1) / COUNT
+        repeated = min(timeit.repeat(stmt, globals={'fresh': fresh}, number=1, repeat=5)) / COUNT
+        print(f'{name:<15} first: {first * 1e9:8.0f} ns   repeated: {repeated * 1e9:6.0f} ns')
+    cpath = cpaths[-1]
+    number = 200000
+    repeated = min(timeit.repeat('hash(cpath)', globals={'cpath': cpath}, number=number, repeat=5)) / number
+    print(f'{"hash":<15} {"":25}repeated: {repeated * 1e9:6.0f} ns')
+
+
+if __name__ == '__main__':
+    main()
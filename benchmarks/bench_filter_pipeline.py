@@ -0,0 +1,38 @@
+"""
+Walks filtered by a cpath checker against the same filters as a FilterPipeline, whose name and stat stages reject
+entries before their cpaths are made.
+    python benchmarks/bench_filter_pipeline.py
+"""
+import os
+from _bench_utils import make_path_tree, temp_tree, best_of
+from PyPathTree import FilterPipeline
+
+
+def main():
+    with temp_tree(dirs_per_level=10, files_per_dir=40, levels=3, file_size=16) as tree:
+        for i in range(0, 40, 4):
+            os.rename(os.path.join(tree.root, f'file-{i}.md'), os.path.join(tree.root, f'file-{i}.txt'))
+        # no interning, every walk makes its cpaths
+        path_tree = make_path_tree(tree.root)
+        path_tree = type(path_tree)(path_tree.host, cpath_cache_size=0)
+        print(f'{tree.file_count} files')
+
+        cases = (
+            ('extension', lambda c: c.is_dir or c.extension == 'txt', FilterPipeline(extensions=('txt', ))),
+            ('hidden/prefix', lambda c: not c.basename.startswith(('.', 'dir-1')),
+             FilterPipeline(include_hidden=False, exclude_prefixes=('dir-1', ))),
+            ('size', lambda c: c.is_dir or c.stat().size > 100, FilterPipeline(min_size=101)),
+        )
+        for name, checker, pipeline in cases:
+            t_checker, res_checker = best_of(lambda: path_tree.list_cpaths(checker=checker))
+            t_pipeline, res_pipeline = best_of(lambda: path_tree.list_cpaths(checker=pipeline))
+            assert res_checker == res_pipeline
+            print(f'{name:<14} checker {t_checker:8.3f} s  pipeline {t_pipeline:8.3f} s  '
+                  f'({t_checker / t_pipeline:.1f}x)  {sum(map(len, res_pipeline))} paths')
+            pipeline.reset_counters()
+            path_tree.list_cpaths(checker=pipeline)
+            print(f'{"":<14} {pipeline.counters}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""
+Micro benchmarks of PathTree.to_cpath_ccomps() for the typical inputs. Keep an eye on these numbers when the
+normalizer is touched.
+"""
+import timeit
+import tempfile
+from _bench_utils import make_path_tree
+
+NUMBER = 100000
+
+
+def main():
+    path_tree = make_path_tree(tempfile.gettempdir())
+    cpath = path_tree.create_file_cpath('content/posts/2019/hello.md')
+    inputs = (
+        ('short relative string', ('posts/hello.md', )),
+        ('string with .. and //', ('posts//2019/../hello.md', )),
+        ('several strings', ('content', 'posts', 'hello.md')),
+        ('nested lists', (['content', ['posts', ('2019', 'hello.md')]], )),
+        ('normalized ccomps tuple', (cpath.cpath_comps, )),
+        ('path comps tuple', (cpath.path_comps, )),
+        ('existing cpath', (cpath, )),
+        ('cpath and a string', (cpath.parent_cpath, 'hello.md')),
+    )
+    for name, args in inputs:
+        best = min(timeit.repeat(lambda: path_tree.to_cpath_ccomps(*args), number=NUMBER, repeat=5)) / NUMBER
+        print(f'{name:<26} {best * 1e9:8.0f} ns   -> {path_tree.to_cpath_ccomps(*args)}')
+
+
+if __name__ == '__main__':
+    main()
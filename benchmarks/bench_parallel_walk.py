@@ -0,0 +1,42 @@
+"""
+Measures list_cpaths(workers=N) against the sequential walk on a backend that sleeps on every listing, like a
+network mount does. Change LATENCY to match the mount you care about.
+"""
+import time
+from _bench_utils import make_path_tree, temp_tree, best_of
+from PyPathTree.backends import FileSystemBackend
+
+LATENCY = 0.002
+
+
+class LatencyBackend(FileSystemBackend):
+    def __init__(self, latency):
+        self.latency = latency
+
+    def listdir(self, path):
+        time.sleep(self.latency)
+        return super().listdir(path)
+
+    def scandir(self, path):
+        time.sleep(self.latency)
+        return super().scandir(path)
+
+
+def main():
+    with temp_tree(dirs_per_level=6, files_per_dir=10, levels=4) as tree:
+        path_tree = make_path_tree(tree.root, LatencyBackend(LATENCY))
+        expected = path_tree.list_cpaths()
+        sequential, _ = best_of(path_tree.list_cpaths, repeat=3)
+        print(f'latency per listing: {LATENCY * 1000:.1f} ms, {len(expected[0])} dirs, {len(expected[1])} files')
+        print(f'sequential          {sequential * 1000:10.2f} ms')
+        for workers in (2, 4, 8, 16, 32):
+            for ordered in (True, False):
+                wall, res = best_of(lambda: path_tree.list_cpaths(workers=workers, ordered=ordered), repeat=3)
+                if ordered:
+                    assert res == expected
+                label = f'workers={workers}' + ('' if ordered else ' unordered')
+                print(f'{label:<20}{wall * 1000:10.2f} ms   speedup: {sequential / wall:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Compares the scandir based walk of list_cpaths() against the old listdir + is_file/is_dir walk.
+The old walk is reproduced by a backend that does not override scandir(), so the contract's default scandir() checks
+the type of every entry separately like the old loop did.
+"""
+import collections
+from _bench_utils import make_path_tree, temp_tree, best_of
+from PyPathTree import BaseFsBackendContract
+from PyPathTree.backends import FileSystemBackend
+
+
+class CountingBackend(FileSystemBackend):
+    def __init__(self):
+        self.calls = collections.Counter()
+
+    def listdir(self, path):
+        self.calls['listdir'] += 1
+        return super().listdir(path)
+
+    def scandir(self, path):
+        self.calls['scandir'] += 1
+        return super().scandir(path)
+
+    def is_file(self, path):
+        self.calls['is_file'] += 1
+        return super().is_file(path)
+
+    def is_dir(self, path):
+        self.calls['is_dir'] += 1
+        return super().is_dir(path)
+
+    def exists(self, path):
+        self.calls['exists'] += 1
+        return super().exists(path)
+
+
+class LegacyCountingBackend(CountingBackend):
+    def scandir(self, path):
+        self.calls['scandir'] += 1
+        return BaseFsBackendContract.scandir(self, path)
+
+
+def run(name, fs_class, root, file_count):
+    fs = fs_class()
+    path_tree = make_path_tree(root, fs)
+    path_tree.list_cpaths()
+    calls = dict(fs.calls)
+    wall, (dirs, files) = best_of(path_tree.list_cpaths)
+    assert len(files) == file_count
+    per_entry_stats = calls.get('is_file', 0) + calls.get('is_dir', 0)
+    print(f'{name:<10} {wall * 1000:10.2f} ms   listings: {calls["scandir"]:6}'
+          f'   per entry stats: {per_entry_stats:8}   ({len(dirs)} dirs, {len(files)} files)')
+    return wall
+
+
+def main():
+    with temp_tree(dirs_per_level=10, files_per_dir=30, levels=4) as tree:
+        legacy = run('legacy', LegacyCountingBackend, tree.root, tree.file_count)
+        scandir = run('scandir', CountingBackend, tree.root, tree.file_count)
+        print(f'speedup: {legacy / scandir:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
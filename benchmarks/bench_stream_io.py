@@ -0,0 +1,88 @@
+"""
+Throughput of the streaming I/O of _CPath across file sizes: copying with the old 1024 byte loop, through a reused
+buffer and in the kernel (copy_file_range/sendfile), and reading whole or in chunks.
+The numbers of the copies include the page cache, run it a few times for stable results.
+"""
+import io
+import os
+import shutil
+import tempfile
+from _bench_utils import make_path_tree, best_of
+
+SIZES_MB = (1, 16, 128)
+
+
+class _NoFileno(io.RawIOBase):
+    """Readable stream without a file descriptor, so that the copy goes through the python buffer"""
+    def __init__(self, fo):
+        self.fo = fo
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        return self.fo.readinto(b)
+
+
+def old_write_stream(cpath, stream):
+    with cpath.open('wb') as fw:
+        data = stream.read(1024)
+        while data:
+            fw.write(data)
+            data = stream.read(1024)
+
+
+def copy_1024(src, dst):
+    with src.open('rb') as fr:
+        old_write_stream(dst, fr)
+
+
+def copy_buffered(src, dst):
+    with src.open('rb') as fr:
+        dst.write_stream(_NoFileno(fr))
+
+
+def copy_kernel(src, dst):
+    src.copy_to(dst)
+
+
+def read_whole(src, dst):
+    src.read_bytes()
+
+
+def read_chunks(src, dst):
+    for _ in src.iter_chunks(reuse_buffer=True):
+        pass
+
+
+CASES = (
+    ('copy, 1024 byte loop', copy_1024),
+    ('copy, reused 1 MiB buffer', copy_buffered),
+    ('copy, kernel', copy_kernel),
+    ('read_bytes()', read_whole),
+    ('iter_chunks(reuse_buffer)', read_chunks),
+)
+
+
+def main():
+    root = tempfile.mkdtemp(prefix='pypathtree-bench-')
+    try:
+        path_tree = make_path_tree(root)
+        for size_mb in SIZES_MB:
+            src = path_tree.create_cpath(f'src-{size_mb}.bin', is_file=True)
+            dst = path_tree.create_cpath(f'dst-{size_mb}.bin', is_file=True)
+            with src.open('wb') as fw:
+                chunk = os.urandom(1024 * 1024)
+                for _ in range(size_mb):
+                    fw.write(chunk)
+            print(f'{size_mb} MiB')
+            for name, fn in CASES:
+                repeat = 3 if size_mb >= 128 else 5
+                best, _ = best_of(lambda: fn(src, dst), repeat=repeat)
+                print(f'  {name:<28} {size_mb / best:9.0f} MiB/s')
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,10 @@
 from PyPathTree.simple_host import SimpleHost
-from PyPathTree.contracts.fs_backend import BaseFsBackendContract
+from PyPathTree.contracts.fs_backend import BaseFsBackendContract, FsEntry, FsStat
 from PyPathTree.exceptions import *
 from PyPathTree.path_tree import PathTree
+from PyPathTree.async_path_tree import AsyncPathTree
+from PyPathTree.patterns import PatternSet
+from PyPathTree.sync import SyncReport
+from PyPathTree.collection import CPathCollection
+from PyPathTree.tree_stats import TreeStats
+from PyPathTree.filters import FilterPipeline
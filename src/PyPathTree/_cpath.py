@@ -1,9 +1,19 @@
 import re
 from collections import deque
+from PyPathTree.patterns import compile_regex
+from PyPathTree import _stream
+from PyPathTree.tree_stats import TreeStats
 
 regex_type = type(re.compile(""))
 
 
+def _extension(name):
+    """Extension of a file name (without the dot), '' when it has none. What _CPath.extension is made of, for code
+    that only has names"""
+    base, dot, ext = name.rpartition('.')
+    return ext if dot else ''
+
+
 class _CPath:
     """
     CPath => Content Path
@@ -12,7 +22,12 @@ class _CPath:
     2. String Path will be indicated as path
     """
 
+    # cpaths are immutable: slots keep them small and the derived values below are computed once on first access.
+    __slots__ = ('__path_tree', '__cpath_special_comps', '__site', '__is_file', '__path_comps', '__hash',
+                 '__relative_path', '__abs_path', '__id', '__extension')
+
     def __init__(self, path_tree, site, cpath_special_comps, is_file=True):
+        cpath_special_comps = tuple(cpath_special_comps)
         self.__path_tree = path_tree
         self.__cpath_special_comps = cpath_special_comps
         self.__site = site
@@ -31,6 +46,13 @@ class _CPath:
             comps = comps[1:]
 
         self.__path_comps = comps
+        self.__hash = hash(comps)
+
+        # lazily computed
+        self.__relative_path = None
+        self.__abs_path = None
+        self.__id = None
+        self.__extension = None
 
     @property
     def site(self):
@@ -66,11 +88,13 @@ class _CPath:
         """
         Relative paths are relative from site root.
         """
-        return self.__path_tree.join_comps(*self.__cpath_special_comps).replace('\\', '/')
+        if self.__relative_path is None:
+            self.__relative_path = self.__path_tree.join_comps(*self.__cpath_special_comps).replace('\\', '/')
+        return self.__relative_path
 
     @property
     def path_comps(self):
-        return tuple(self.__path_comps)
+        return self.__path_comps
 
     @property
     def path_comps_w_site(self):
@@ -80,11 +104,13 @@ class _CPath:
     def cpath_comps(self):
         """Special cpath comps that can have '' empty string on both ends - path tree's to components make this
         special components"""
-        return tuple(self.__cpath_special_comps)
+        return self.__cpath_special_comps
 
     @property
     def abs_path(self):
-        return self.__path_tree.get_full_path(self.__cpath_special_comps)
+        if self.__abs_path is None:
+            self.__abs_path = self.__path_tree.get_full_path(self.__cpath_special_comps)
+        return self.__abs_path
 
     @property
     def is_file(self):
@@ -99,7 +125,7 @@ class _CPath:
         """
         Relative base name
         """
-        return self.path_comps[-1]
+        return self.__path_comps[-1]
 
     @property
     def basename_wo_ext(self):
@@ -121,15 +147,12 @@ class _CPath:
 
     @property
     def extension(self, dot_count=1):
-        if self.is_file:
-            dotted_parts = self.basename.rsplit(".", maxsplit=dot_count)
-            if not len(dotted_parts) < dot_count + 1:
-                ext = ".".join(dotted_parts[-dot_count:])
-                return ext
-        return ''
+        if self.__extension is None:
+            self.__extension = _extension(self.basename) if self.is_file else ''
+        return self.__extension
 
     def list_cpaths(self, files_only=None, directories_only=None, depth=None, exclude_compss=(), checker=None,
-                    respect_settings=True):
+                    respect_settings=True, workers=None, ordered=True, patterns=None, processes=None):
         return self.__path_tree.list_cpaths(
             files_only=files_only,
             directories_only=directories_only,
@@ -137,19 +160,55 @@ class _CPath:
             depth=depth,
             exclude_compss=exclude_compss,
             checker=checker,
-            respect_settings=respect_settings
+            respect_settings=respect_settings,
+            workers=workers,
+            ordered=ordered,
+            patterns=patterns,
+            processes=processes
         )
 
-    def list_files(self, depth=None, exclude_compss=(), checker=None, respect_settings=True):
+    def list_files(self, depth=None, exclude_compss=(), checker=None, respect_settings=True, workers=None,
+                   ordered=True, patterns=None, processes=None):
         _, cfiles = self.list_cpaths(files_only=True, depth=depth, exclude_compss=exclude_compss, checker=checker,
-                                     respect_settings=respect_settings)
+                                     respect_settings=respect_settings, workers=workers, ordered=ordered,
+                                     patterns=patterns, processes=processes)
         return cfiles
 
-    def list_dirs(self, depth=None, exclude_compss=(), checker=None, respect_settings=True):
+    def list_dirs(self, depth=None, exclude_compss=(), checker=None, respect_settings=True, workers=None,
+                  ordered=True, patterns=None, processes=None):
         dirs, _ = self.list_cpaths(directories_only=True, depth=depth, exclude_compss=exclude_compss, checker=checker,
-                                   respect_settings=respect_settings)
+                                   respect_settings=respect_settings, workers=workers, ordered=ordered,
+                                   patterns=patterns, processes=processes)
         return dirs
 
+    def iter_cpaths(self, files_only=None, directories_only=None, depth=None, exclude_compss=(), checker=None,
+                    respect_settings=True, workers=None, ordered=True, patterns=None, processes=None):
+        return self.__path_tree.iter_cpaths(
+            files_only=files_only,
+            directories_only=directories_only,
+            initial_path_comps=self,
+            depth=depth,
+            exclude_compss=exclude_compss,
+            checker=checker,
+            respect_settings=respect_settings,
+            workers=workers,
+            ordered=ordered,
+            patterns=patterns,
+            processes=processes
+        )
+
+    def iter_files(self, depth=None, exclude_compss=(), checker=None, respect_settings=True, workers=None,
+                   ordered=True, patterns=None, processes=None):
+        return self.__path_tree.iter_file_cpaths(self, depth=depth, exclude_compss=exclude_compss, checker=checker,
+                                                 respect_settings=respect_settings, workers=workers, ordered=ordered,
+                                                 patterns=patterns, processes=processes)
+
+    def iter_dirs(self, depth=None, exclude_compss=(), checker=None, respect_settings=True, workers=None,
+                  ordered=True, patterns=None, processes=None):
+        return self.__path_tree.iter_dir_cpaths(self, depth=depth, exclude_compss=exclude_compss, checker=checker,
+                                                respect_settings=respect_settings, workers=workers, ordered=ordered,
+                                                patterns=patterns, processes=processes)
+
     def exists(self):
         """Real time checking"""
         return self.__path_tree.exists(self.__cpath_special_comps)
@@ -160,7 +219,7 @@ class _CPath:
 
     def makedirs(self):
         assert self.is_dir
-        return self.__path_tree.fs.makedirs(self.abs_path)
+        return self.__path_tree.makedirs(self)
 
     def write_text(self, text):
         assert isinstance(text, str)
@@ -169,34 +228,74 @@ class _CPath:
             fw.write(text)
 
     def write_bytes(self, data):
-        isinstance(data, (bytes, bytearray))
-        assert isinstance(data, str)
+        assert isinstance(data, (bytes, bytearray, memoryview))
         assert self.is_file
         with self.open('wb') as fw:
             fw.write(data)
 
-    def write_stream(self, stream, close_on_done=False):
+    def write_stream(self, stream, close_on_done=False, buffer_size=_stream.DEFAULT_BUFFER_SIZE):
+        """Writes the rest of the binary stream, copied in the kernel when it is a regular file and the backend opens
+        regular files too. Returns the number of bytes written."""
         assert hasattr(stream, 'read')
         assert self.is_file
         with self.open('wb') as fw:
-            data = stream.read(1024)
-            while data:
-                fw.write(data)
-                data = stream.read(1024)
+            written = _stream.copy_stream(stream, fw, buffer_size)
         if close_on_done:
             stream.close()
+        return written
 
-    def write_text_stream(self, stream, close_on_done=False):
+    def write_text_stream(self, stream, close_on_done=False, buffer_size=_stream.DEFAULT_BUFFER_SIZE):
         assert hasattr(stream, 'read')
         assert self.is_file
         with self.open('w', encoding='utf-8') as fw:
-            data = stream.read(1024)
+            data = stream.read(buffer_size)
             while data:
                 fw.write(data)
-                data = stream.read(1024)
+                data = stream.read(buffer_size)
         if close_on_done:
             stream.close()
 
+    def read_bytes(self):
+        assert self.is_file
+        with self.open('rb') as fr:
+            return fr.read()
+
+    def read_text(self, encoding='utf-8'):
+        assert self.is_file
+        with self.open('r', encoding=encoding) as fr:
+            return fr.read()
+
+    def iter_chunks(self, chunk_size=_stream.DEFAULT_BUFFER_SIZE, reuse_buffer=False):
+        """Content of the file in chunks of chunk_size bytes. With reuse_buffer the chunks are memoryviews of one
+        buffer that is read into again and again, so a chunk is only valid until the next one is taken."""
+        assert self.is_file
+        with self.open('rb') as fr:
+            yield from _stream.iter_chunks(fr, chunk_size, reuse_buffer)
+
+    def stats(self):
+        """TreeStats of everything under the directory, or of the file itself, see PathTree.du()"""
+        if self.is_dir:
+            return self.__path_tree.du(self, depth=0)[self]
+        return TreeStats(1, 0, self.stat().size, {self.extension: 1})
+
+    def fingerprint(self):
+        """Hex digest of the content, see PathTree.fingerprint_many()"""
+        assert self.is_file
+        return self.__path_tree.fingerprint(self)
+
+    def mmap(self):
+        """Read only memory map of the content, see PathTree.mmap()"""
+        assert self.is_file
+        return self.__path_tree.mmap(self)
+
+    def copy_to(self, other, buffer_size=_stream.DEFAULT_BUFFER_SIZE):
+        """Copies the content of this file into the file cpath other (of this or another path tree), in the kernel
+        when both are regular files. Returns the number of bytes copied."""
+        assert self.is_file
+        assert type(other) is _CPath and other.is_file
+        with self.open('rb') as fr:
+            return other.write_stream(fr, buffer_size=buffer_size)
+
     def make_file(self):
         assert self.is_file
         with self.open('wb') as fw:
@@ -222,10 +321,7 @@ class _CPath:
     def __process_regex(regex, ignorecase=True):
         """Matches against relative path"""
         if isinstance(regex, str):
-            if ignorecase:
-                regex = re.compile(regex, re.IGNORECASE)
-            else:
-                regex = re.compile(regex, re.IGNORECASE)
+            regex = compile_regex(regex, ignorecase)
         else:
             assert type(regex) is regex_type, "regex argument must provide compiled regular expression or string"
         return regex
@@ -245,17 +341,26 @@ class _CPath:
         regex = self.__process_regex(regex, ignorecase)
         return regex.match(self.extension)
 
+    def match_patterns(self, pattern_set):
+        """Matches against a PatternSet (globs and compiled regexes with include and exclude lists)"""
+        return pattern_set.match_cpath(self)
+
     def startswith(self, *comps):
-        ccomps = self.__path_tree.to_cpath_ccomps(comps)
-        if not (len(self.path_comps) < len(ccomps)):
-            if self.path_comps[:len(ccomps)] == ccomps:
+        # compared with path comps (no '' on the ends) of the argument, the cpath comps of it never matched.
+        comps = self.__path_tree.to_path_comps(comps)
+        if comps == ('', ):
+            return True
+        if not (len(self.__path_comps) < len(comps)):
+            if self.__path_comps[:len(comps)] == comps:
                 return True
         return False
 
     def endswith(self, *comps):
-        ccomps = self.__path_tree.to_cpath_ccomps(comps)
-        if not (len(self.path_comps) < len(ccomps)):
-            if self.path_comps[-len(ccomps):] == ccomps:
+        comps = self.__path_tree.to_path_comps(comps)
+        if comps == ('', ):
+            return True
+        if not (len(self.__path_comps) < len(comps)):
+            if self.__path_comps[-len(comps):] == comps:
                 return True
         return False
 
@@ -265,17 +370,26 @@ class _CPath:
     def getctime(self):
         return self.__path_tree.fs.getctime(self.abs_path)
 
+    def stat(self):
+        """Size, mtime, ctime and mode in one call, see PathTree.stat()"""
+        return self.__path_tree.stat(self)
+
     @property
     def id(self):
-        return '/'.join(self.path_comps)
+        if self.__id is None:
+            self.__id = '/'.join(self.__path_comps)
+        return self.__id
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, self.__class__):
             return False
-        return self.path_comps == other.path_comps and self.is_file == other.is_file
+        return self.__hash == other.__hash and self.__path_comps == other.__path_comps and \
+            self.__is_file == other.__is_file
 
     def __hash__(self):
-        return hash(self.path_comps)
+        return self.__hash
 
     def __str__(self):
         return f"CPath: {self.relative_path}"
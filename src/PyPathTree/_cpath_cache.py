@@ -0,0 +1,52 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+CPathCacheInfo = namedtuple('CPathCacheInfo', ('hits', 'misses', 'evictions', 'maxsize', 'currsize'))
+
+
+class _CPathCache:
+    """
+    Bounded LRU of interned cpaths keyed by (ccomps, is_file).
+    maxsize 0 disables interning: every lookup is a miss and nothing is kept.
+    """
+    def __init__(self, maxsize):
+        assert isinstance(maxsize, int) and maxsize >= 0, f"maxsize must be a non negative int, {maxsize} found"
+        self.__maxsize = maxsize
+        self.__cpaths = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    def get_or_create(self, key, factory):
+        with self.__lock:
+            cpath = self.__cpaths.get(key, None)
+            if cpath is not None:
+                self.__cpaths.move_to_end(key)
+                self.__hits += 1
+                return cpath
+            self.__misses += 1
+
+        cpath = factory()
+        if self.__maxsize == 0:
+            return cpath
+
+        with self.__lock:
+            # another thread may have created the same one in the meantime, keep the first one canonical.
+            cpath = self.__cpaths.setdefault(key, cpath)
+            self.__cpaths.move_to_end(key)
+            while len(self.__cpaths) > self.__maxsize:
+                self.__cpaths.popitem(last=False)
+                self.__evictions += 1
+        return cpath
+
+    def info(self):
+        with self.__lock:
+            return CPathCacheInfo(self.__hits, self.__misses, self.__evictions, self.__maxsize, len(self.__cpaths))
+
+    def clear(self):
+        with self.__lock:
+            self.__cpaths.clear()
+            self.__hits = 0
+            self.__misses = 0
+            self.__evictions = 0
@@ -0,0 +1,115 @@
+import io
+import os
+import stat
+
+# large enough to keep the number of python level iterations (and system calls) low for big files
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+# bytes per system call of the kernel copy
+_KERNEL_CHUNK = 64 * 1024 * 1024
+
+
+def _regular_fd(fo, kinds):
+    """fd of a binary file object on a regular file, None for anything else (memory files, pipes, text files)"""
+    if not isinstance(fo, kinds):
+        return None
+    try:
+        fd = fo.fileno()
+        if not stat.S_ISREG(os.fstat(fd).st_mode):
+            return None
+    except (OSError, ValueError, io.UnsupportedOperation):
+        return None
+    return fd
+
+
+def _kernel_copy(src, dst):
+    """Copies the rest of src into dst without the data coming into python: copy_file_range (can share the blocks on
+    filesystems that support reflinks) or sendfile. Returns the number of bytes copied, None when it cannot be done."""
+    src_fd = _regular_fd(src, (io.BufferedReader, io.BufferedRandom, io.FileIO))
+    dst_fd = _regular_fd(dst, (io.BufferedWriter, io.BufferedRandom, io.FileIO))
+    if src_fd is None or dst_fd is None:
+        return None
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    sendfile = getattr(os, 'sendfile', None)
+    if copy_file_range is None and sendfile is None:
+        return None
+
+    # positions of the python objects, the read ahead buffer of src is not at the fd offset
+    src_pos = src.tell()
+    dst.flush()
+    dst_pos = dst.tell()
+    copied = 0
+    try:
+        while True:
+            if copy_file_range is not None:
+                try:
+                    n = copy_file_range(src_fd, dst_fd, _KERNEL_CHUNK, src_pos + copied, dst_pos + copied)
+                except OSError:
+                    if copied != 0:
+                        raise
+                    # e.g. across filesystems on older kernels
+                    copy_file_range = None
+                    if sendfile is None:
+                        return None
+                    continue
+            else:
+                os.lseek(dst_fd, dst_pos + copied, os.SEEK_SET)
+                try:
+                    n = sendfile(dst_fd, src_fd, src_pos + copied, _KERNEL_CHUNK)
+                except OSError:
+                    if copied != 0:
+                        raise
+                    return None
+            if n == 0:
+                break
+            copied += n
+    finally:
+        # keep the python objects in line with what was copied
+        src.seek(src_pos + copied)
+        dst.seek(dst_pos + copied)
+    return copied
+
+
+def copy_stream(src, dst, buffer_size=DEFAULT_BUFFER_SIZE):
+    """Copies the rest of the binary stream src into dst and returns the number of bytes copied.
+    Regular files are copied in the kernel, other streams through one reused buffer (readinto() when src has it)."""
+    assert buffer_size > 0
+    copied = _kernel_copy(src, dst)
+    if copied is not None:
+        return copied
+
+    copied = 0
+    readinto = getattr(src, 'readinto', None)
+    if readinto is not None:
+        buffer = bytearray(buffer_size)
+        view = memoryview(buffer)
+        while True:
+            n = readinto(view)
+            if not n:
+                break
+            dst.write(view[:n])
+            copied += n
+    else:
+        data = src.read(buffer_size)
+        while data:
+            dst.write(data)
+            copied += len(data)
+            data = src.read(buffer_size)
+    return copied
+
+
+def iter_chunks(fo, chunk_size=DEFAULT_BUFFER_SIZE, reuse_buffer=False):
+    """Chunks of the binary file object as bytes, or memoryviews of one buffer that is read into again and again
+    with reuse_buffer (a chunk is only valid until the next one is taken)"""
+    assert chunk_size > 0
+    if reuse_buffer and hasattr(fo, 'readinto'):
+        view = memoryview(bytearray(chunk_size))
+        while True:
+            n = fo.readinto(view)
+            if not n:
+                break
+            yield view[:n]
+    else:
+        data = fo.read(chunk_size)
+        while data:
+            yield data
+            data = fo.read(chunk_size)
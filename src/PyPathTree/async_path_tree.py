@@ -0,0 +1,132 @@
+import asyncio
+from PyPathTree.path_tree import PathTree
+
+
+def _next_batch(iterator, size):
+    batch = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) == size:
+            break
+    return batch
+
+
+class AsyncPathTree(object):
+    """
+    Asyncio face of a PathTree.
+    Every blocking call is run on an executor (the default executor of the loop when none is given) through the
+    wrapped path tree, so paths are normalized and confined to the root exactly like the sync API.
+    """
+    def __init__(self, path_tree, executor=None, max_concurrency=16):
+        assert isinstance(path_tree, PathTree)
+        assert max_concurrency > 0
+        self.__path_tree = path_tree
+        self.__executor = executor
+        self.__max_concurrency = max_concurrency
+
+    @property
+    def path_tree(self):
+        return self.__path_tree
+
+    async def __run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, fn, *args)
+
+    async def exists(self, *path) -> bool:
+        return await self.__run(self.__path_tree.exists, *path)
+
+    async def is_file(self, *path) -> bool:
+        return await self.__run(self.__path_tree.is_file, *path)
+
+    async def is_dir(self, *path) -> bool:
+        return await self.__run(self.__path_tree.is_dir, *path)
+
+    async def makedirs(self, *dir_path):
+        return await self.__run(self.__path_tree.makedirs, *dir_path)
+
+    async def open(self, file_path, *args, **kwargs):
+        """Opens on the executor. The returned file object is a regular blocking one, use read_*/write_* methods to
+        keep the reads and writes off the loop too"""
+        return await self.__run(lambda: self.__path_tree.open(file_path, *args, **kwargs))
+
+    async def aiter_cpaths(self, initial_path_comps=(), files_only=None, directories_only=None, depth=None,
+                           exclude_compss=(), checker=None, respect_settings=True, workers=None, ordered=True,
+                           patterns=None, processes=None, batch_size=256):
+        """Async variant of PathTree.iter_cpaths(). The walk runs on the executor and cpaths are handed over to the
+        loop in batches of batch_size."""
+        iterator = self.__path_tree.iter_cpaths(
+            initial_path_comps, files_only=files_only, directories_only=directories_only, depth=depth,
+            exclude_compss=exclude_compss, checker=checker, respect_settings=respect_settings, workers=workers,
+            ordered=ordered, patterns=patterns, processes=processes)
+        try:
+            while True:
+                batch = await self.__run(_next_batch, iterator, batch_size)
+                if not batch:
+                    break
+                for cpath in batch:
+                    yield cpath
+        finally:
+            await self.__run(iterator.close)
+
+    async def aiter_file_cpaths(self, initial_path_comps=(), depth=None, exclude_compss=(), checker=None,
+                                respect_settings=True, workers=None, ordered=True, patterns=None, processes=None,
+                                batch_size=256):
+        async for cpath in self.aiter_cpaths(initial_path_comps, files_only=True, depth=depth,
+                                             exclude_compss=exclude_compss, checker=checker,
+                                             respect_settings=respect_settings, workers=workers, ordered=ordered,
+                                             patterns=patterns, processes=processes, batch_size=batch_size):
+            if cpath.is_file:
+                yield cpath
+
+    async def aiter_dir_cpaths(self, initial_path_comps='', depth=None, exclude_compss=(), checker=None,
+                               respect_settings=True, workers=None, ordered=True, patterns=None, processes=None,
+                               batch_size=256):
+        async for cpath in self.aiter_cpaths(initial_path_comps, directories_only=True, depth=depth,
+                                             exclude_compss=exclude_compss, checker=checker,
+                                             respect_settings=respect_settings, workers=workers, ordered=ordered,
+                                             patterns=patterns, processes=processes, batch_size=batch_size):
+            if cpath.is_dir:
+                yield cpath
+
+    async def read_bytes(self, cpath):
+        return await self.__run(cpath.read_bytes)
+
+    async def read_text(self, cpath, encoding='utf-8'):
+        return await self.__run(cpath.read_text, encoding)
+
+    async def write_text(self, cpath, text):
+        return await self.__run(cpath.write_text, text)
+
+    async def write_bytes(self, cpath, data):
+        return await self.__run(cpath.write_bytes, data)
+
+    async def write_stream(self, cpath, stream, close_on_done=False):
+        return await self.__run(cpath.write_stream, stream, close_on_done)
+
+    async def getmtime(self, cpath):
+        return await self.__run(cpath.getmtime)
+
+    async def getctime(self, cpath):
+        return await self.__run(cpath.getctime)
+
+    async def __gather_bounded(self, fn, cpaths, max_concurrency):
+        semaphore = asyncio.Semaphore(max_concurrency or self.__max_concurrency)
+
+        async def one(cpath):
+            async with semaphore:
+                return await self.__run(fn, cpath)
+        return await asyncio.gather(*(one(cpath) for cpath in cpaths))
+
+    async def getmtime_many(self, cpaths, max_concurrency=None):
+        """Modification times of the cpaths in the same order, at most max_concurrency (or the one given at
+        construction) stat calls run at the same time"""
+        return await self.__gather_bounded(lambda cpath: cpath.getmtime(), cpaths, max_concurrency)
+
+    async def getctime_many(self, cpaths, max_concurrency=None):
+        return await self.__gather_bounded(lambda cpath: cpath.getctime(), cpaths, max_concurrency)
+
+    async def stat_many(self, cpaths, max_concurrency=None):
+        """FsStat of every cpath as a dict in the order given, see PathTree.stat_many()"""
+        cpaths = list(cpaths)
+        stats = await self.__gather_bounded(self.__path_tree.stat, cpaths, max_concurrency)
+        return dict(zip(cpaths, stats))
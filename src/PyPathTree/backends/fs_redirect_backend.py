@@ -1,5 +1,268 @@
-from PyPathTree import BaseFsBackendContract
+import os
+import threading
+from collections import OrderedDict
+from PyPathTree import BaseFsBackendContract, FsEntry
+from PyPathTree import PathTreeError
+from .real_fs_backend import FileSystemBackend
+from .in_memory_backend import InMemoryBackend
 
 
 class FileSystemRedirectBackend(BaseFsBackendContract):
-    pass
+    """
+    Copy on write overlay over the real file system.
+    Reads fall through to the lower backend (the real file system by default), writes, makedirs and removes are
+    redirected to the upper layer: in memory by default or, when redirect_root is given, a scratch directory where
+    the paths are recreated under it. Nothing reaches the lower backend until commit() applies all the pending changes
+    in one ordered pass: directories (parents first), then file contents, then removes.
+    """
+    COPY_BUFFER_SIZE = 1024 * 1024
+
+    def __init__(self, lower=None, upper=None, redirect_root=None):
+        assert upper is None or redirect_root is None, "Give either upper or redirect_root, not both"
+        if lower is None:
+            lower = FileSystemBackend()
+        if upper is None:
+            upper = InMemoryBackend() if redirect_root is None else FileSystemBackend()
+        assert isinstance(lower, BaseFsBackendContract) and isinstance(upper, BaseFsBackendContract)
+        self.__lower = lower
+        self.__upper = upper
+        self.__redirect_root = redirect_root
+        # normalized paths of lower files removed in the overlay
+        self.__whiteouts = set()
+        # normalized path -> ('makedirs', 'write' or 'remove', path as given), in the order they were last touched.
+        # Keyed like the whiteouts so that two spellings of one path are one change
+        self.__pending = OrderedDict()
+        self.__lock = threading.RLock()
+
+    @property
+    def lower(self):
+        return self.__lower
+
+    @property
+    def upper(self):
+        return self.__upper
+
+    @property
+    def pending(self):
+        """Pending changes as (operation, path) pairs"""
+        with self.__lock:
+            return tuple(self.__pending.values())
+
+    @staticmethod
+    def __key(path):
+        return '/' + '/'.join(comp for comp in path.replace('\\', '/').split('/') if comp not in ('', '.'))
+
+    def __up(self, path):
+        if self.__redirect_root is None:
+            return path
+        return os.path.join(self.__redirect_root, os.path.splitdrive(path)[1].lstrip('/\\'))
+
+    def __record(self, path, op):
+        key = self.__key(path)
+        self.__pending.pop(key, None)
+        self.__pending[key] = (op, path)
+
+    @staticmethod
+    def __parent(path):
+        return path.rstrip('/\\').replace('\\', '/').rpartition('/')[0] or '/'
+
+    def __in_upper(self, path):
+        return self.__upper.exists(self.__up(path))
+
+    def __in_lower(self, path):
+        return self.__key(path) not in self.__whiteouts and self.__lower.exists(path)
+
+    def __ensure_upper_dir(self, path):
+        up = self.__up(path)
+        if not self.__upper.is_dir(up):
+            self.__upper.makedirs(up)
+
+    def __copy(self, src_fs, src_path, dst_fs, dst_path):
+        with src_fs.open(src_path, 'rb') as fr, dst_fs.open(dst_path, 'wb') as fw:
+            data = fr.read(self.COPY_BUFFER_SIZE)
+            while data:
+                fw.write(data)
+                data = fr.read(self.COPY_BUFFER_SIZE)
+
+    def open(self, path, mode='r', *args, **kwargs):
+        with self.__lock:
+            if self.is_dir(path):
+                raise PathTreeError(f'Redirect File System Error (occurred during opening path {path}):\n'
+                                    f'is a directory')
+            if set(mode) & set('wax+') == set():
+                # read only
+                if self.__in_upper(path):
+                    return self.__upper.open(self.__up(path), mode, *args, **kwargs)
+                if self.__in_lower(path):
+                    return self.__lower.open(path, mode, *args, **kwargs)
+                raise PathTreeError(f'Redirect File System Error (occurred during opening path {path}):\n'
+                                    f'no such file')
+
+            exists = self.exists(path)
+            if 'x' in mode and exists:
+                raise PathTreeError(f'Redirect File System Error (occurred during opening path {path}):\n'
+                                    f'file exists')
+            if 'r' in mode and not exists:
+                raise PathTreeError(f'Redirect File System Error (occurred during opening path {path}):\n'
+                                    f'no such file')
+            if not self.is_dir(self.__parent(path)):
+                raise PathTreeError(f'Redirect File System Error (occurred during opening path {path}):\n'
+                                    f'parent directory does not exist')
+
+            self.__ensure_upper_dir(self.__parent(path))
+            if exists and not self.__in_upper(path) and ('a' in mode or 'r' in mode):
+                # copy up the content that the mode keeps
+                self.__copy(self.__lower, path, self.__upper, self.__up(path))
+            self.__whiteouts.discard(self.__key(path))
+            self.__record(path, 'write')
+            return self.__upper.open(self.__up(path), mode.replace('x', 'w'), *args, **kwargs)
+
+    def exists(self, path):
+        with self.__lock:
+            return self.__in_upper(path) or self.__in_lower(path)
+
+    def is_file(self, path):
+        with self.__lock:
+            if self.__in_upper(path):
+                return self.__upper.is_file(self.__up(path))
+            return self.__in_lower(path) and self.__lower.is_file(path)
+
+    def is_dir(self, path):
+        with self.__lock:
+            if self.__in_upper(path):
+                return self.__upper.is_dir(self.__up(path))
+            return self.__in_lower(path) and self.__lower.is_dir(path)
+
+    def listdir(self, path):
+        return [entry.name for entry in self.scandir(path)]
+
+    def scandir(self, path):
+        with self.__lock:
+            if not self.is_dir(path):
+                raise PathTreeError(f'Redirect File System Error (occurred during scanning path: {path}):\n'
+                                    f'not a directory')
+            base = path.rstrip('/\\')
+            entries = OrderedDict()
+            if self.__upper.is_dir(self.__up(path)):
+                for entry in self.__upper.scandir(self.__up(path)):
+                    entries[entry.name] = FsEntry(entry.name, base + '/' + entry.name, entry.is_file(),
+                                                  entry.is_dir())
+            if self.__in_lower(path) and self.__lower.is_dir(path):
+                for entry in self.__lower.scandir(path):
+                    entry_path = base + '/' + entry.name
+                    if entry.name not in entries and self.__key(entry_path) not in self.__whiteouts:
+                        entries[entry.name] = FsEntry(entry.name, entry_path, entry.is_file(), entry.is_dir())
+            return list(entries.values())
+
+    def makedirs(self, path):
+        with self.__lock:
+            if self.exists(path):
+                raise PathTreeError(f'Redirect File System Error (occurred during making directory with path: '
+                                    f'{path}):\nfile exists')
+            self.__upper.makedirs(self.__up(path))
+            self.__whiteouts.discard(self.__key(path))
+            self.__record(path, 'makedirs')
+
+    def getmtime(self, path):
+        with self.__lock:
+            if self.__in_upper(path):
+                return self.__upper.getmtime(self.__up(path))
+            if self.__in_lower(path):
+                return self.__lower.getmtime(path)
+        raise PathTreeError(f'Redirect File System Error (occurred during getmtime on path: {path}):\n'
+                            f'no such file or directory')
+
+    def getctime(self, path):
+        with self.__lock:
+            if self.__in_upper(path):
+                return self.__upper.getctime(self.__up(path))
+            if self.__in_lower(path):
+                return self.__lower.getctime(path)
+        raise PathTreeError(f'Redirect File System Error (occurred during getctime on path: {path}):\n'
+                            f'no such file or directory')
+
+    def set_mtime(self, path, mtime):
+        with self.__lock:
+            if not self.__in_upper(path):
+                if not self.__in_lower(path):
+                    raise PathTreeError(f'Redirect File System Error (occurred during set_mtime on path: {path}):\n'
+                                        f'no such file or directory')
+                if self.__lower.is_dir(path):
+                    # directories of the overlay are merged with the lower ones, the mtime stays in the overlay
+                    self.__upper.makedirs(self.__up(path))
+                else:
+                    self.__ensure_upper_dir(self.__parent(path))
+                    self.__copy(self.__lower, path, self.__upper, self.__up(path))
+                    self.__record(path, 'write')
+            return self.__upper.set_mtime(self.__up(path), mtime)
+
+    def stat(self, path):
+        with self.__lock:
+            if self.__in_upper(path):
+                return self.__upper.stat(self.__up(path))
+            if self.__in_lower(path):
+                return self.__lower.stat(path)
+        raise PathTreeError(f'Redirect File System Error (occurred during stat on path: {path}):\n'
+                            f'no such file or directory')
+
+    def mmap(self, path):
+        with self.__lock:
+            if self.__in_upper(path):
+                return self.__upper.mmap(self.__up(path))
+            if self.__in_lower(path):
+                return self.__lower.mmap(path)
+        raise PathTreeError(f'Redirect File System Error (occurred during mmap on path: {path}):\n'
+                            f'no such file')
+
+    def remove(self, path):
+        with self.__lock:
+            if not self.is_file(path):
+                raise PathTreeError(f'Redirect File System Error (occurred during remove on path: {path}):\n'
+                                    f'no such file')
+            if self.__in_upper(path):
+                self.__upper.remove(self.__up(path))
+            if self.__in_lower(path):
+                self.__whiteouts.add(self.__key(path))
+                self.__record(path, 'remove')
+            else:
+                # created in the overlay only, nothing to do on commit
+                self.__pending.pop(self.__key(path), None)
+
+    def commit(self):
+        """Applies the pending changes to the lower backend and returns them as (operation, path) pairs"""
+        with self.__lock:
+            applied = self.pending
+            makedirs = sorted((path for op, path in applied if op == 'makedirs'), key=lambda p: len(self.__key(p)))
+            for path in makedirs:
+                if self.__lower.is_file(path):
+                    self.__lower.remove(path)
+                if not self.__lower.exists(path):
+                    self.__lower.makedirs(path)
+            for op, path in applied:
+                if op == 'write':
+                    if self.__lower.is_dir(path):
+                        raise PathTreeError(f'Redirect File System Error (occurred during commit on path: {path}):\n'
+                                            f'a directory is in the way')
+                    self.__copy(self.__upper, self.__up(path), self.__lower, path)
+                    # the mtime the file has in the overlay, not the time of the commit
+                    self.__lower.set_mtime(path, self.__upper.getmtime(self.__up(path)))
+            for op, path in applied:
+                if op == 'remove' and self.__lower.is_file(path):
+                    self.__lower.remove(path)
+
+            self.__forget(applied)
+            return applied
+
+    def discard(self):
+        """Drops all the pending changes, the lower backend stays as it is"""
+        with self.__lock:
+            self.__forget(self.pending)
+
+    def __forget(self, changes):
+        # committed or discarded files are read from the lower one from now on. Directories stay in the upper
+        # layer, they are merged with the lower ones anyway.
+        for op, path in changes:
+            if op == 'write' and self.__upper.is_file(self.__up(path)):
+                self.__upper.remove(self.__up(path))
+        self.__pending.clear()
+        self.__whiteouts.clear()
@@ -1,6 +1,218 @@
-from PyPathTree import BaseFsBackendContract
+import io
+import stat
+import time
+import threading
+from PyPathTree import BaseFsBackendContract, FsEntry, FsStat
+from PyPathTree import PathTreeError
+
+
+class _MemDir:
+    def __init__(self):
+        self.children = {}
+        self.ctime = self.mtime = time.time()
+
+
+class _MemFile:
+    def __init__(self):
+        self.data = b''
+        self.ctime = self.mtime = time.time()
+
+
+class _MemFileIO(io.BytesIO):
+    """BytesIO that stores its content back into the file node on flush and close"""
+    def __init__(self, node, initial, writable, readable):
+        super().__init__(initial)
+        self.__node = node
+        self.__writable = writable
+        self.__readable = readable
+
+    def readable(self):
+        return self.__readable
+
+    def writable(self):
+        return self.__writable
+
+    def read(self, *args):
+        if not self.__readable:
+            raise io.UnsupportedOperation('not readable')
+        return super().read(*args)
+
+    def readinto(self, b):
+        if not self.__readable:
+            raise io.UnsupportedOperation('not readable')
+        return super().readinto(b)
+
+    def write(self, b):
+        if not self.__writable:
+            raise io.UnsupportedOperation('not writable')
+        return super().write(b)
+
+    def flush(self):
+        super().flush()
+        if self.__writable and not self.closed:
+            self.__node.data = self.getvalue()
+            self.__node.mtime = time.time()
+
+    def close(self):
+        if not self.closed:
+            self.flush()
+        super().close()
 
 
 class InMemoryBackend(BaseFsBackendContract):
-    pass
+    """
+    A file system that lives in a dict of dicts, nothing is read from or written to the disk.
+    Paths are absolute paths like the ones the path tree makes from its root, the root itself must be created first:
+        fs = InMemoryBackend()
+        fs.makedirs(path_tree.host.root_path)
+        path_tree.__set_fs__(fs)
+    """
+    def __init__(self):
+        self.__root = _MemDir()
+        self.__lock = threading.RLock()
+
+    @staticmethod
+    def __split(path):
+        return [comp for comp in path.replace('\\', '/').split('/') if comp not in ('', '.')]
+
+    def __lookup(self, path):
+        node = self.__root
+        for comp in self.__split(path):
+            if type(node) is not _MemDir:
+                return None
+            node = node.children.get(comp, None)
+            if node is None:
+                return None
+        return node
+
+    def __parent_and_name(self, path, operation):
+        comps = self.__split(path)
+        if not comps:
+            raise PathTreeError(f'In Memory File System Error (occurred during {operation} on path {path}):\n'
+                                f'the root has no parent')
+        parent = self.__lookup('/'.join(comps[:-1]))
+        if type(parent) is not _MemDir:
+            raise PathTreeError(f'In Memory File System Error (occurred during {operation} on path {path}):\n'
+                                f'parent directory does not exist')
+        return parent, comps[-1]
+
+    def open(self, path, mode='r', buffering=-1, encoding=None, errors=None, newline=None, **kwargs):
+        assert set(mode) <= set('rwaxbt+') and sum(mode.count(c) for c in 'rwax') == 1, f'Invalid mode: {mode}'
+        with self.__lock:
+            node = self.__lookup(path)
+            if type(node) is _MemDir:
+                raise PathTreeError(f'In Memory File System Error (occurred during opening path {path}):\n'
+                                    f'is a directory')
+            if node is None:
+                if 'r' in mode:
+                    raise PathTreeError(f'In Memory File System Error (occurred during opening path {path}):\n'
+                                        f'no such file')
+                parent, name = self.__parent_and_name(path, 'opening')
+                node = parent.children[name] = _MemFile()
+                parent.mtime = node.mtime
+            elif 'x' in mode:
+                raise PathTreeError(f'In Memory File System Error (occurred during opening path {path}):\n'
+                                    f'file exists')
+
+            initial = b'' if 'w' in mode else node.data
+            fo = _MemFileIO(node, initial, writable='r' not in mode or '+' in mode,
+                            readable='r' in mode or '+' in mode)
+            if 'w' in mode:
+                fo.flush()
+            if 'a' in mode:
+                fo.seek(0, io.SEEK_END)
+
+        if 'b' in mode:
+            return fo
+        return io.TextIOWrapper(fo, encoding=encoding or 'utf-8', errors=errors, newline=newline)
+
+    def exists(self, path):
+        with self.__lock:
+            return self.__lookup(path) is not None
+
+    def is_file(self, path):
+        with self.__lock:
+            return type(self.__lookup(path)) is _MemFile
+
+    def is_dir(self, path):
+        with self.__lock:
+            return type(self.__lookup(path)) is _MemDir
+
+    def __get_dir(self, path, operation):
+        node = self.__lookup(path)
+        if type(node) is not _MemDir:
+            raise PathTreeError(f'In Memory File System Error (occurred during {operation} path: {path}):\n'
+                                f'not a directory')
+        return node
+
+    def listdir(self, path):
+        with self.__lock:
+            return list(self.__get_dir(path, 'listing').children)
+
+    def scandir(self, path):
+        with self.__lock:
+            node = self.__get_dir(path, 'scanning')
+            base = path.rstrip('/\\')
+            return [FsEntry(name, base + '/' + name, type(child) is _MemFile, type(child) is _MemDir)
+                    for name, child in node.children.items()]
+
+    def makedirs(self, path):
+        with self.__lock:
+            if self.__lookup(path) is not None:
+                raise PathTreeError(f'In Memory File System Error (occurred during making directory with path: '
+                                    f'{path}):\nfile exists')
+            node = self.__root
+            for comp in self.__split(path):
+                child = node.children.get(comp, None)
+                if child is None:
+                    child = node.children[comp] = _MemDir()
+                    node.mtime = child.mtime
+                elif type(child) is not _MemDir:
+                    raise PathTreeError(f'In Memory File System Error (occurred during making directory with path: '
+                                        f'{path}):\na file is in the way')
+                node = child
+
+    def __get(self, path, operation):
+        node = self.__lookup(path)
+        if node is None:
+            raise PathTreeError(f'In Memory File System Error (occurred during {operation} on path: {path}):\n'
+                                f'no such file or directory')
+        return node
+
+    def getmtime(self, path):
+        with self.__lock:
+            return self.__get(path, 'getmtime').mtime
+
+    def getctime(self, path):
+        with self.__lock:
+            return self.__get(path, 'getctime').ctime
+
+    def remove(self, path):
+        with self.__lock:
+            if type(self.__get(path, 'remove')) is not _MemFile:
+                raise PathTreeError(f'In Memory File System Error (occurred during remove on path: {path}):\n'
+                                    f'is a directory')
+            parent, name = self.__parent_and_name(path, 'remove')
+            del parent.children[name]
+            parent.mtime = time.time()
+
+    def set_mtime(self, path, mtime):
+        with self.__lock:
+            self.__get(path, 'set_mtime').mtime = mtime
+        return True
+
+    def stat(self, path):
+        with self.__lock:
+            node = self.__get(path, 'stat')
+            if type(node) is _MemDir:
+                return FsStat(0, node.mtime, node.ctime, stat.S_IFDIR | 0o755)
+            return FsStat(len(node.data), node.mtime, node.ctime, stat.S_IFREG | 0o644)
 
+    def mmap(self, path):
+        # the content is immutable bytes, a view of it is the current content without copying
+        with self.__lock:
+            node = self.__get(path, 'mmap')
+            if type(node) is _MemDir:
+                raise PathTreeError(f'In Memory File System Error (occurred during mmap on path: {path}):\n'
+                                    f'is a directory')
+            return memoryview(node.data)
@@ -1,6 +1,7 @@
 import os
 import os.path
-from PyPathTree import BaseFsBackendContract
+import mmap as _mmap
+from PyPathTree import BaseFsBackendContract, FsStat
 from PyPathTree import PathTreeError
 
 
@@ -55,6 +56,18 @@ class FileSystemBackend(BaseFsBackendContract):
             )
         return res
 
+    def scandir(self, path):
+        # os.DirEntry caches the type it gets from the listing, so is_file()/is_dir() on them do not stat again.
+        try:
+            with os.scandir(path) as it:
+                res = list(it)
+        except (OSError, IOError) as e:
+            raise PathTreeError(
+                f'Synamic File System Error (occurred during scanning path: {path}):\n'
+                f'{str(e)}'
+            )
+        return res
+
     def makedirs(self, path):
         try:
             res = os.makedirs(path)
@@ -94,3 +107,51 @@ class FileSystemBackend(BaseFsBackendContract):
                 f'{str(e)}'
             )
         return res
+
+    def set_mtime(self, path, mtime):
+        try:
+            os.utime(path, (os.stat(path).st_atime, mtime))
+        except (OSError, IOError) as e:
+            raise PathTreeError(
+                f'Synamic File System Error (occurred during set_mtime on path: {path}):\n'
+                f'{str(e)}'
+            )
+        return True
+
+    def stat(self, path):
+        try:
+            res = FsStat.from_os_stat(os.stat(path))
+        except (OSError, IOError) as e:
+            raise PathTreeError(
+                f'Synamic File System Error (occurred during stat on path: {path}):\n'
+                f'{str(e)}'
+            )
+        return res
+
+    def mmap(self, path):
+        try:
+            with open(path, 'rb') as fr:
+                if os.fstat(fr.fileno()).st_size == 0:
+                    # an empty file cannot be mapped
+                    return memoryview(b'')
+                # the map stays valid after the file is closed
+                res = _mmap.mmap(fr.fileno(), 0, access=_mmap.ACCESS_READ)
+        except (OSError, IOError, ValueError) as e:
+            raise PathTreeError(
+                f'Synamic File System Error (occurred during mmap on path: {path}):\n'
+                f'{str(e)}'
+            )
+        return res
+
+    def stat_entry(self, entry):
+        if not isinstance(entry, os.DirEntry):
+            return self.stat(entry.path)
+        # os.DirEntry caches the result of its first stat() call
+        try:
+            res = FsStat.from_os_stat(entry.stat())
+        except (OSError, IOError) as e:
+            raise PathTreeError(
+                f'Synamic File System Error (occurred during stat on path: {entry.path}):\n'
+                f'{str(e)}'
+            )
+        return res
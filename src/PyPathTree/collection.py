@@ -0,0 +1,229 @@
+from array import array
+from PyPathTree._cpath import _extension
+
+
+class _PathTable:
+    """
+    Paths as nodes of parallel arrays: the name (index into one table of unique names), the parent node (-1 for the
+    entries of the root), the depth and the kind of every node. Parents always come before their children.
+    Collections made from one another share it.
+    """
+    __slots__ = ('names', 'name_ids', 'parents', 'depths', 'kinds', 'lookup', 'name_lookup')
+
+    def __init__(self):
+        self.names = []
+        self.name_ids = array('i')
+        self.parents = array('i')
+        self.depths = array('H')
+        # 1 file, 0 directory
+        self.kinds = bytearray()
+        # only while the table is being built
+        self.lookup = {}
+        self.name_lookup = {}
+
+    def add(self, comps, is_file):
+        """Node of the path comps, adding the ones of its parents that are not there yet"""
+        parent = -1
+        lookup = self.lookup
+        last = len(comps) - 1
+        for depth, name in enumerate(comps):
+            key = (parent, name)
+            node = lookup.get(key, None)
+            if node is None:
+                name_id = self.name_lookup.get(name, None)
+                if name_id is None:
+                    name_id = self.name_lookup[name] = len(self.names)
+                    self.names.append(name)
+                node = lookup[key] = len(self.parents)
+                self.name_ids.append(name_id)
+                self.parents.append(parent)
+                self.depths.append(depth + 1)
+                self.kinds.append(1 if is_file and depth == last else 0)
+            parent = node
+        return parent
+
+    def done(self):
+        self.lookup = None
+        self.name_lookup = None
+
+    def comps(self, node):
+        names = self.names
+        name_ids = self.name_ids
+        parents = self.parents
+        comps = []
+        while node != -1:
+            comps.append(names[name_ids[node]])
+            node = parents[node]
+        return tuple(reversed(comps))
+
+    def find(self, comps):
+        """Node of the path comps, -1 for the root and None when it is not in the table"""
+        node = -1
+        for name in comps:
+            for idx in range(node + 1, len(self.parents)):
+                if self.parents[idx] == node and self.names[self.name_ids[idx]] == name:
+                    node = idx
+                    break
+            else:
+                return None
+        return node
+
+
+class CPathCollection(object):
+    """
+    Compact result of a walk, see PathTree.collect_cpaths().
+    Paths are kept in a shared string table with integer parent/name arrays instead of a cpath object (and its comps
+    tuples) each, cpaths are made on demand when the collection is iterated or indexed. Filters and sorting work on the
+    arrays and give new collections sharing the table.
+    """
+    def __init__(self, path_tree, table, members):
+        self.__path_tree = path_tree
+        self.__table = table
+        # nodes of the table that are in this collection, in order
+        self.__members = members
+
+    @classmethod
+    def from_cpaths(cls, path_tree, cpaths):
+        """Collection of the cpaths of an iterable, they are not kept"""
+        table = _PathTable()
+        members = array('i')
+        for cpath in cpaths:
+            comps = cpath.path_comps
+            if comps == ('', ):
+                continue
+            members.append(table.add(comps, cpath.is_file))
+        table.done()
+        return cls(path_tree, table, members)
+
+    @property
+    def path_tree(self):
+        return self.__path_tree
+
+    def __len__(self):
+        return len(self.__members)
+
+    def __bool__(self):
+        return len(self.__members) != 0
+
+    def __cpath(self, node, dir_comps_memo=None):
+        table = self.__table
+        parent = table.parents[node]
+        if dir_comps_memo is None:
+            comps = table.comps(node)
+        else:
+            parent_comps = dir_comps_memo.get(parent, None)
+            if parent_comps is None:
+                parent_comps = dir_comps_memo[parent] = table.comps(parent)
+            comps = (*parent_comps, table.names[table.name_ids[node]])
+        return self.__path_tree.create_cpath(comps, is_file=table.kinds[node] == 1)
+
+    def __iter__(self):
+        # comps of the parent directories are made once per iteration
+        dir_comps_memo = {-1: ()}
+        for node in self.__members:
+            yield self.__cpath(node, dir_comps_memo)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return CPathCollection(self.__path_tree, self.__table, self.__members[idx])
+        return self.__cpath(self.__members[idx])
+
+    def to_list(self):
+        return list(self)
+
+    def relative_paths(self):
+        """'/' joined relative paths of the members, without making cpaths"""
+        table = self.__table
+        for node in self.__members:
+            yield '/'.join(table.comps(node))
+
+    def __filtered(self, predicate):
+        return CPathCollection(self.__path_tree, self.__table,
+                               array('i', (node for node in self.__members if predicate(node))))
+
+    def files(self):
+        kinds = self.__table.kinds
+        return self.__filtered(lambda node: kinds[node] == 1)
+
+    def dirs(self):
+        kinds = self.__table.kinds
+        return self.__filtered(lambda node: kinds[node] == 0)
+
+    def with_extension(self, *extensions):
+        """Files with one of the extensions ('md' or '.md')"""
+        extensions = {ext[1:] if ext.startswith('.') else ext for ext in extensions}
+        table = self.__table
+        names, name_ids, kinds = table.names, table.name_ids, table.kinds
+        # per unique name, not per path
+        matching_names = {name_id for name_id, name in enumerate(names) if _extension(name) in extensions}
+        return self.__filtered(lambda node: kinds[node] == 1 and name_ids[node] in matching_names)
+
+    def with_depth(self, min_depth=None, max_depth=None):
+        """Members with min_depth <= number of path comps <= max_depth"""
+        depths = self.__table.depths
+        min_depth = 0 if min_depth is None else min_depth
+        max_depth = 65535 if max_depth is None else max_depth
+        return self.__filtered(lambda node: min_depth <= depths[node] <= max_depth)
+
+    def under(self, *path):
+        """Members under the directory path (not the directory itself)"""
+        comps = self.__path_tree.to_path_comps(*path)
+        comps = () if comps == ('', ) else comps
+        table = self.__table
+        top = table.find(comps)
+        if top is None:
+            return CPathCollection(self.__path_tree, table, array('i'))
+        if top == -1:
+            return CPathCollection(self.__path_tree, table, array('i', self.__members))
+        # parents come before children, so one pass marks everything under it
+        parents = table.parents
+        marks = bytearray(len(parents))
+        for node in range(top + 1, len(parents)):
+            parent = parents[node]
+            if parent == top or (parent > top and marks[parent]):
+                marks[node] = 1
+        return self.__filtered(lambda node: marks[node] == 1)
+
+    def __path_ranks(self):
+        """Rank of every node in the order of comps tuples (depth first with children sorted by name)"""
+        table = self.__table
+        names, name_ids, parents = table.names, table.name_ids, table.parents
+        children = {}
+        for node in range(len(parents)):
+            children.setdefault(parents[node], []).append(node)
+        ranks = array('i', bytes(4 * len(parents)))
+        rank = 0
+        to_visit = sorted(children.get(-1, ()), key=lambda n: names[name_ids[n]], reverse=True)
+        while len(to_visit) != 0:
+            node = to_visit.pop()
+            ranks[node] = rank
+            rank += 1
+            nodes = children.get(node, None)
+            if nodes is not None:
+                to_visit.extend(sorted(nodes, key=lambda n: names[name_ids[n]], reverse=True))
+        return ranks
+
+    def sorted(self, key='path', reverse=False):
+        """New collection sorted by 'path' (comps), 'name', 'extension' or 'depth'"""
+        table = self.__table
+        names, name_ids = table.names, table.name_ids
+        if key == 'path':
+            ranks = self.__path_ranks()
+            key_fn = ranks.__getitem__
+        elif key == 'name':
+            def key_fn(node):
+                return names[name_ids[node]]
+        elif key == 'extension':
+            kinds = table.kinds
+
+            def key_fn(node):
+                return _extension(names[name_ids[node]]) if kinds[node] == 1 else ''
+        elif key == 'depth':
+            key_fn = table.depths.__getitem__
+        else:
+            raise ValueError(f'key must be path, name, extension or depth, {key} found')
+        return CPathCollection(self.__path_tree, table, array('i', sorted(self.__members, key=key_fn,
+                                                                          reverse=reverse)))
+
+    def __repr__(self):
+        return f'<CPathCollection of {len(self.__members)} paths>'
@@ -1,4 +1,44 @@
 import abc
+import stat as _stat
+from collections import namedtuple
+
+
+class FsStat(namedtuple('FsStat', ('size', 'mtime', 'ctime', 'mode'))):
+    """Compact stat result of a path, see BaseFsBackendContract.stat()"""
+    __slots__ = ()
+
+    @classmethod
+    def from_os_stat(cls, st):
+        return cls(st.st_size, st.st_mtime, st.st_ctime, st.st_mode)
+
+
+class FsEntry:
+    """
+    An entry of a directory listing, the part of os.DirEntry that the path tree uses.
+    The type of the entry is known at the time of listing so that no more stat is needed later.
+    """
+    def __init__(self, name, path, is_file, is_dir):
+        self.__name = name
+        self.__path = path
+        self.__is_file = is_file
+        self.__is_dir = is_dir
+
+    @property
+    def name(self):
+        return self.__name
+
+    @property
+    def path(self):
+        return self.__path
+
+    def is_file(self):
+        return self.__is_file
+
+    def is_dir(self):
+        return self.__is_dir
+
+    def __repr__(self):
+        return f"<FsEntry {self.__name!r}>"
 
 
 class BaseFsBackendContract(metaclass=abc.ABCMeta):
@@ -22,6 +62,18 @@ class BaseFsBackendContract(metaclass=abc.ABCMeta):
     def listdir(self, path):
         """Lists a directory"""
 
+    def scandir(self, path):
+        """Lists a directory as entries that know their name, path and type (see FsEntry).
+        This default one checks the type of every entry separately, backends that get the type with the listing
+        itself should override it"""
+        entries = []
+        for name in self.listdir(path):
+            entry_path = path.rstrip('/\\') + '/' + name
+            is_file = self.is_file(entry_path)
+            is_dir = not is_file and self.is_dir(entry_path)
+            entries.append(FsEntry(name, entry_path, is_file, is_dir))
+        return entries
+
     @abc.abstractmethod
     def makedirs(self, path):
         """Makes directories recursively"""
@@ -37,3 +89,30 @@ class BaseFsBackendContract(metaclass=abc.ABCMeta):
     @abc.abstractmethod
     def remove(self, path):
         """Removes the path"""
+
+    def stat(self, path):
+        """Size, mtime, ctime and mode of the path in one FsStat.
+        This default one is made of the other methods, backends that can get them at once should override it"""
+        if self.is_dir(path):
+            size = 0
+            mode = _stat.S_IFDIR | 0o755
+        else:
+            with self.open(path, 'rb') as fr:
+                size = fr.seek(0, 2)
+            mode = _stat.S_IFREG | 0o644
+        return FsStat(size, self.getmtime(path), self.getctime(path), mode)
+
+    def set_mtime(self, path, mtime):
+        """Sets the modification time of the path (keeping its access time), returns False when the backend cannot.
+        This default one cannot"""
+        return False
+
+    def stat_entry(self, entry):
+        """FsStat of an entry returned by scandir(), backends whose entries cache stat data should use it"""
+        return self.stat(entry.path)
+
+    def mmap(self, path):
+        """Read only buffer of the whole content of a file, a memory map on backends that can map files.
+        This default one reads the file into memory and returns a memoryview of it"""
+        with self.open(path, 'rb') as fr:
+            return memoryview(fr.read())
@@ -0,0 +1,125 @@
+from collections import namedtuple
+from PyPathTree._cpath import _extension
+
+NAME_STAGE = 'name'
+STAT_STAGE = 'stat'
+CPATH_STAGE = 'cpath'
+
+StageCounter = namedtuple('StageCounter', ('hits', 'misses'))
+
+
+class FilterPipeline(object):
+    """
+    A checker for the walks (checker=FilterPipeline(...)) in three stages, each one only paid for the entries that the
+    ones before it let through:
+    1. name: hidden names, name prefixes/suffixes, file extensions and a name(name, is_file) callable, on the name of
+       the listing entry before any cpath is made. A directory rejected here is not walked into.
+    2. stat: size and mtime windows and a stat(FsStat) callable, for files only, with the stat data of the listing entry.
+    3. cpath: the usual checker(cpath) on the cpath made for the entry.
+    Counters tell per stage how many entries passed (hits) and were rejected (misses), for the stages that are set.
+    Where only a cpath is at hand (sharded walks) calling the pipeline with it runs all the stages.
+    """
+    def __init__(self, include_hidden=True, exclude_prefixes=(), exclude_suffixes=(), extensions=None,
+                 exclude_extensions=(), name=None, min_size=None, max_size=None, modified_after=None,
+                 modified_before=None, stat=None, checker=None):
+        self.__include_hidden = include_hidden
+        self.__exclude_prefixes = tuple(exclude_prefixes)
+        self.__exclude_suffixes = tuple(exclude_suffixes)
+        self.__extensions = None if extensions is None else frozenset(self.__normalize_extensions(extensions))
+        self.__exclude_extensions = frozenset(self.__normalize_extensions(exclude_extensions))
+        self.__name = name
+        self.__min_size = min_size
+        self.__max_size = max_size
+        self.__modified_after = modified_after
+        self.__modified_before = modified_before
+        self.__stat = stat
+        self.__checker = checker
+
+        self.__has_name_stage = not include_hidden or bool(self.__exclude_prefixes) or \
+            bool(self.__exclude_suffixes) or self.__extensions is not None or bool(self.__exclude_extensions) or \
+            name is not None
+        self.__has_stat_stage = min_size is not None or max_size is not None or modified_after is not None or \
+            modified_before is not None or stat is not None
+        # stage -> [hits, misses]
+        self.__counters = {}
+        self.reset_counters()
+
+    @staticmethod
+    def __normalize_extensions(extensions):
+        if isinstance(extensions, str):
+            extensions = (extensions, )
+        return (ext[1:] if ext.startswith('.') else ext for ext in extensions)
+
+    @property
+    def has_cpath_stage(self):
+        return self.__checker is not None
+
+    @property
+    def counters(self):
+        """stage -> StageCounter(hits, misses) of the stages that are set"""
+        return {stage: StageCounter(*counter) for stage, counter in self.__counters.items()}
+
+    def reset_counters(self):
+        counters = {}
+        if self.__has_name_stage:
+            counters[NAME_STAGE] = [0, 0]
+        if self.__has_stat_stage:
+            counters[STAT_STAGE] = [0, 0]
+        if self.__checker is not None:
+            counters[CPATH_STAGE] = [0, 0]
+        self.__counters = counters
+
+    def __count(self, stage, passed):
+        self.__counters[stage][0 if passed else 1] += 1
+        return passed
+
+    def __check_name(self, name, is_file):
+        if not self.__include_hidden and name.startswith('.'):
+            return False
+        if self.__exclude_prefixes and name.startswith(self.__exclude_prefixes):
+            return False
+        if self.__exclude_suffixes and name.endswith(self.__exclude_suffixes):
+            return False
+        if is_file and (self.__extensions is not None or self.__exclude_extensions):
+            ext = _extension(name)
+            if self.__extensions is not None and ext not in self.__extensions:
+                return False
+            if ext in self.__exclude_extensions:
+                return False
+        if self.__name is not None and not self.__name(name, is_file):
+            return False
+        return True
+
+    def __check_stat(self, fs_stat):
+        if self.__min_size is not None and fs_stat.size < self.__min_size:
+            return False
+        if self.__max_size is not None and fs_stat.size > self.__max_size:
+            return False
+        if self.__modified_after is not None and fs_stat.mtime < self.__modified_after:
+            return False
+        if self.__modified_before is not None and fs_stat.mtime > self.__modified_before:
+            return False
+        if self.__stat is not None and not self.__stat(fs_stat):
+            return False
+        return True
+
+    def check_entry(self, entry, is_file, stat_entry):
+        """Name and stat stages on a listing entry, stat_entry(entry) is only called when the name stage passes"""
+        if self.__has_name_stage and not self.__count(NAME_STAGE, self.__check_name(entry.name, is_file)):
+            return False
+        if is_file and self.__has_stat_stage and not self.__count(STAT_STAGE, self.__check_stat(stat_entry(entry))):
+            return False
+        return True
+
+    def check_cpath(self, cpath):
+        """The cpath stage"""
+        if self.__checker is None:
+            return True
+        return self.__count(CPATH_STAGE, bool(self.__checker(cpath)))
+
+    def __call__(self, cpath):
+        if self.__has_name_stage and not self.__count(NAME_STAGE, self.__check_name(cpath.basename, cpath.is_file)):
+            return False
+        if cpath.is_file and self.__has_stat_stage and not self.__count(STAT_STAGE, self.__check_stat(cpath.stat())):
+            return False
+        return self.check_cpath(cpath)
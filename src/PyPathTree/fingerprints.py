@@ -0,0 +1,116 @@
+import os
+import gzip
+import json
+import hashlib
+import threading
+from PyPathTree import _stream
+from PyPathTree.tree_index import is_racy
+
+HASH_NAME = 'blake2b'
+DIGEST_SIZE = 16
+
+
+def _new_hash():
+    return hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+
+def hash_stream(fo, chunk_size=_stream.DEFAULT_BUFFER_SIZE):
+    """Hex digest of the rest of a binary file object, read in large chunks into one buffer"""
+    h = _new_hash()
+    for chunk in _stream.iter_chunks(fo, chunk_size, reuse_buffer=True):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def _hash_file(abs_path):
+    # runs in the worker processes of PathTree.fingerprint_many(), so it must stay a picklable top level function
+    with open(abs_path, 'rb') as fr:
+        return hash_stream(fr)
+
+
+def merkle_digest(children):
+    """Digest of a directory from (name, is_file, digest) of its entries, independent of the order of the listing"""
+    h = _new_hash()
+    for name, is_file, digest in sorted(children):
+        h.update(b'f' if is_file else b'd')
+        h.update(name.encode('utf-8', 'surrogateescape'))
+        h.update(b'\0')
+        h.update(digest.encode('ascii'))
+        h.update(b'\n')
+    return h.hexdigest()
+
+
+class FingerprintCache(object):
+    """
+    Persistent cache of the content digests of the files of a path tree.
+    A file is hashed again only when its size or mtime is not the stored one. Files modified too recently (see
+    tree_index.is_racy()) are not kept.
+    """
+    VERSION = 1
+
+    def __init__(self, path_tree, cache_path):
+        self.__path_tree = path_tree
+        self.__cache_path = cache_path
+        # abs path -> (size, mtime, digest)
+        self.__entries = {}
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def cache_path(self):
+        return self.__cache_path
+
+    @property
+    def stats(self):
+        """Number of digests reused and computed since the last clear()"""
+        return {'hits': self.__hits, 'misses': self.__misses, 'files': len(self.__entries)}
+
+    def __root(self):
+        return self.__path_tree.host.abs_root_path
+
+    def load(self):
+        """Loads the cache file, returns False when there is none or it is for another root, version or hash"""
+        if not os.path.exists(self.__cache_path):
+            return False
+        with gzip.open(self.__cache_path, 'rt', encoding='utf-8') as fr:
+            data = json.load(fr)
+        if data.get('version') != self.VERSION or data.get('root') != self.__root() or \
+                data.get('hash') != HASH_NAME:
+            return False
+        entries = {path: tuple(entry) for path, entry in data['files'].items()}
+        with self.__lock:
+            self.__entries = entries
+        return True
+
+    def save(self):
+        with self.__lock:
+            files = {path: list(entry) for path, entry in self.__entries.items()}
+        data = {'version': self.VERSION, 'root': self.__root(), 'hash': HASH_NAME, 'files': files}
+        tmp_path = self.__cache_path + '.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as fw:
+            json.dump(data, fw, separators=(',', ':'))
+        os.replace(tmp_path, self.__cache_path)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries = {}
+            self.__hits = 0
+            self.__misses = 0
+
+    def get(self, abs_path, fs_stat):
+        """Stored digest of the file when its size and mtime did not change, None otherwise"""
+        with self.__lock:
+            entry = self.__entries.get(abs_path, None)
+            if entry is not None and entry[0] == fs_stat.size and entry[1] == fs_stat.mtime:
+                self.__hits += 1
+                return entry[2]
+            self.__misses += 1
+            return None
+
+    def put(self, abs_path, fs_stat, digest):
+        with self.__lock:
+            if not is_racy(fs_stat.mtime):
+                self.__entries[abs_path] = (fs_stat.size, fs_stat.mtime, digest)
+            else:
+                self.__entries.pop(abs_path, None)
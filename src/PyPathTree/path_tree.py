@@ -8,14 +8,31 @@
     status: "Development"
 """
 import re
+import heapq
+import functools
+import contextlib
+import threading
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, as_completed, FIRST_COMPLETED
 from PyPathTree.contracts.fs_backend import BaseFsBackendContract
 from .backends import FileSystemBackend
 from PyPathTree.contracts.host import HostContract
 from PyPathTree.simple_host import SimpleHost
 
-from PyPathTree.exceptions import InvalidCPathComponentError
+from PyPathTree.exceptions import PathTreeError, InvalidCPathComponentError
 from PyPathTree._cpath import _CPath
+from PyPathTree._cpath_cache import _CPathCache
+from PyPathTree.tree_index import TreeIndex
+from PyPathTree.tree_model import TreeModel
+from PyPathTree.watcher import PathTreeWatcher
+from PyPathTree.patterns import PatternSet
+from PyPathTree.filters import FilterPipeline
+from PyPathTree.sync import sync_trees
+from PyPathTree.collection import CPathCollection
+from PyPathTree.tree_stats import disk_usage
+from PyPathTree.sharded_scan import scan_shard
+from PyPathTree.transaction import Transaction
+from PyPathTree.fingerprints import FingerprintCache, merkle_digest, _hash_file, hash_stream
 
 regex_type = type(re.compile(""))
 
@@ -34,12 +51,8 @@ def not_loaded(f):
     return method_wrapper
 
 
-class _Patterns:
-    path_sep = re.compile(r'[\\/]+')
-
-
 class PathTree(object):
-    def __init__(self, host_or_root):
+    def __init__(self, host_or_root, cpath_cache_size=65536):
         if isinstance(host_or_root, str):
             host = SimpleHost(host_or_root, self)
         else:
@@ -53,6 +66,25 @@ class PathTree(object):
         # default backend system
         self.__fs = FileSystemBackend()
         self.__is_loaded = False
+        # trie of the whole tree while loaded, see load()
+        self.__model = None
+
+        # interned cpaths, see create_cpath()
+        self.__cpath_cache = _CPathCache(cpath_cache_size)
+        # listing cache used by the walker, see attach_index()
+        self.__index = None
+        # digests of files by size and mtime, see attach_fingerprint_cache()
+        self.__fingerprint_cache = None
+        # listings with the stats of their files for du(use_cache=True)
+        self.__du_index = None
+        # abs path -> FsStat while stat_cache() is active
+        self.__stat_cache = None
+        self.__stat_cache_depth = 0
+        self.__stat_cache_lock = threading.Lock()
+        # writes are staged in it while transaction() is active
+        self.__transaction = None
+        self.__transaction_depth = 0
+        self.__transaction_lock = threading.Lock()
 
     @property
     def host(self):
@@ -62,23 +94,78 @@ class PathTree(object):
     def fs(self):
         return self.__fs
 
+    @property
+    def index(self):
+        return self.__index
+
+    def attach_index(self, index_path):
+        """Makes list_cpaths() and the other walks use a persistent listing index stored at index_path (outside of the
+        tree). The existing index file is loaded, call index.save() to persist it after walks."""
+        index = TreeIndex(self, index_path)
+        index.load()
+        self.__index = index
+        return index
+
+    def detach_index(self):
+        self.__index = None
+
+    @property
+    def fingerprint_cache(self):
+        return self.__fingerprint_cache
+
+    def attach_fingerprint_cache(self, cache_path):
+        """Makes fingerprint(), fingerprint_many() and merkle_digests() reuse the digests of files whose size and mtime
+        did not change, stored at cache_path (outside of the tree). Call fingerprint_cache.save() to persist it."""
+        cache = FingerprintCache(self, cache_path)
+        cache.load()
+        self.__fingerprint_cache = cache
+        return cache
+
+    def detach_fingerprint_cache(self):
+        self.__fingerprint_cache = None
+
     @property
     def is_loaded(self):
         return self.__is_loaded
 
     @not_loaded
-    def load(self):
+    def load(self, respect_settings=True):
+        """Scans the whole tree into an in memory model, see model. With respect_settings it leaves out what the walks
+        leave out by the ignore settings of the host"""
+        model = TreeModel(self, respect_settings=respect_settings)
+        model.build()
+        self.__model = model
         self.__is_loaded = True
 
+    @loaded
+    def unload(self):
+        self.__model = None
+        self.__is_loaded = False
+
+    @property
+    @loaded
+    def model(self):
+        """TreeModel of the loaded tree: exists/children/list_files(extension=...)/stat queries without touching the
+        backend"""
+        return self.__model
+
+    @loaded
+    def refresh(self, *path):
+        """Scans the path (the whole tree when none is given) into the model again"""
+        self.__model.refresh(*path)
+
+    @loaded
+    def invalidate(self, *path):
+        """Marks the path to be scanned into the model again before the next query on it"""
+        self.__model.invalidate(*path)
+
     @classmethod
     def __str_path_to_comps(cls, path_str):
         # converting sting paths like ('x', 'a/b\\path_comp_str') to ('x', 'a', 'b', 'path_comp_str')
         # assert path_str.strip() != ''  # by empty path we mean site root
-        str_comps = []
-        for path_comp_str in _Patterns.path_sep.split(path_str):
-            path_comp_str = path_comp_str.strip()
-            str_comps.append(path_comp_str)
-        return str_comps
+        # runs of separators give empty strings here that the regex split did not, but the normalization drops
+        # empty comps in the middle and keeps only one at each end, so the result is the same.
+        return [path_comp_str.strip() for path_comp_str in path_str.replace('\\', '/').split('/')]
 
     @classmethod
     def __sequence_path_to_comps(cls, path_sequence):
@@ -95,10 +182,65 @@ class PathTree(object):
 
         return str_comps
 
+    @staticmethod
+    def __normalize_comps(comps):
+        """Single pass over the raw comps: drops empty comps except the first and the last one, skips '.' and resolves
+        '..' (which can never go above the root)"""
+        _ = []
+        last_idx = len(comps) - 1
+        for idx, comp in enumerate(comps):
+            if comp == '':
+                # keep empty string for first and last part, ignore the others
+                if idx == 0 or idx == last_idx:
+                    _.append(comp)
+            elif comp == '..':
+                if idx > 0 and _:
+                    del _[-1]
+            elif comp == '.':
+                # skip
+                continue
+            else:
+                _.append(comp)
+
+        if _ == []:
+            _ = ['']
+        if _[0] != '':
+            _.insert(0, '')
+        return tuple(_)
+
+    @staticmethod
+    def __normalized_sequence_to_ccomps(path_sequence):
+        """Fast path for a sequence of comps that needs no normalization: clean string comps with optional empty
+        strings on the ends, like the cpath_comps and path_comps of cpaths. Returns None when it is not one."""
+        start = 1 if len(path_sequence) != 0 and path_sequence[0] == '' else 0
+        end = len(path_sequence)
+        if end > start and path_sequence[-1] == '':
+            end -= 1
+        for comp in path_sequence[start:end]:
+            if type(comp) is not str or comp in ('', '.', '..') or '/' in comp or '\\' in comp or \
+                    comp.strip() != comp:
+                return None
+        if start == 1:
+            return tuple(path_sequence)
+        return ('', *path_sequence)
+
     @classmethod
     def to_cpath_ccomps(cls, *path_comps):
         """Creates special cpath components that can have '' empty string on both ends
         To get components (without empty string on both ends) use path_comps property on cpath object"""
+        if len(path_comps) == 1:
+            path_comp = path_comps[0]
+            if type(path_comp) is str:
+                return cls.__str_to_cpath_ccomps(path_comp)
+            elif type(path_comp) is _CPath:
+                # path comps of a cpath are normalized already
+                comps = path_comp.path_comps
+                return comps if comps == ('', ) else ('', *comps)
+            elif type(path_comp) in (tuple, list):
+                ccomps = cls.__normalized_sequence_to_ccomps(path_comp)
+                if ccomps is not None:
+                    return ccomps
+
         comps = []
         for path_comp in path_comps:
             if isinstance(path_comp, str):
@@ -115,37 +257,13 @@ class PathTree(object):
                     f" where value is {path_comp}"
                 )
 
-        # remove empty '' part except for the first and last one
-        _ = []
-        for idx, comp in enumerate(comps):
-            if idx in {0, len(comps) - 1}:
-                # keep empty string for first and last part
-                _.append(comp)
-            else:
-                # ignore the empty string.
-                if comp != '':
-                    _.append(comp)
-        comps = _
-
-        # Relative URL processing.
-        _ = []
-        for idx, comp in enumerate(comps):
-            if comp == '..':
-                if idx > 0:
-                    del _[-1]
-            elif comp == '.':
-                # skip
-                continue
-            else:
-                _.append(comp)
-        else:
-            if _ == []:
-                _ = ['']
-            if _[0] != '':
-                _.insert(0, '')
-        comps = _
+        return cls.__normalize_comps(comps)
 
-        return tuple(comps)
+    @classmethod
+    @functools.lru_cache(maxsize=8192)
+    def __str_to_cpath_ccomps(cls, path_str):
+        # memoized, a single string is the most common argument of to_cpath_ccomps()
+        return cls.__normalize_comps(cls.__str_path_to_comps(path_str))
 
     @classmethod
     def to_path_comps(cls, *path_comps):
@@ -178,9 +296,18 @@ class PathTree(object):
                 if len(ccomps) > 1 and ccomps[-1] == '':
                     ccomps = ccomps[:-1]
 
-        path_obj = _CPath(self, self.__host, ccomps, is_file=is_file)
+        # cpaths are immutable, so the same object is handed out for the same path until it is evicted.
+        path_obj = self.__cpath_cache.get_or_create(
+            (ccomps, is_file), lambda: _CPath(self, self.__host, ccomps, is_file=is_file))
         return path_obj
 
+    def cpath_cache_info(self):
+        """Hits, misses, evictions, maxsize and current size of the interned cpaths cache"""
+        return self.__cpath_cache.info()
+
+    def clear_cpath_cache(self):
+        self.__cpath_cache.clear()
+
     def create_file_cpath(self, *path_comps, forgiving=False):
         return self.create_cpath(*path_comps, is_file=True, forgiving=forgiving)
 
@@ -190,18 +317,150 @@ class PathTree(object):
     def exists(self, *path) -> bool:
         comps = self.to_cpath_ccomps(*path)
         """Checks existence relative to the root"""
-        return True if self.__fs.exists(self.__full_path__(comps)) else False
+        fn = self.__full_path__(comps)
+        if self.__transaction is not None and self.__transaction.is_staged_dir(fn):
+            return True
+        return True if self.__fs.exists(self.__resolve(fn)) else False
 
     def is_file(self, *path) -> bool:
         comps = self.to_cpath_ccomps(*path)
         fn = self.__full_path__(comps)
-        return True if self.__fs.is_file(fn) else False
+        return True if self.__fs.is_file(self.__resolve(fn)) else False
 
     def is_dir(self, *path) -> bool:
         comps = self.to_cpath_ccomps(*path)
         fn = self.__full_path__(comps)
+        if self.__transaction is not None and self.__transaction.is_staged_dir(fn):
+            return True
         return True if self.__fs.is_dir(fn) else False
 
+    def stat(self, *path):
+        """FsStat (size, mtime, ctime, mode) of the path, from the build cache when stat_cache() is active"""
+        return self.__stat_abs(self.__resolve(self.__full_path__(self.to_cpath_ccomps(*path))))
+
+    def set_mtime(self, path, mtime):
+        """Sets the modification time of the path (of its staged file in a transaction), False when the backend
+        cannot"""
+        return self.__fs.set_mtime(self.__resolve(self.__full_path__(self.to_cpath_ccomps(path))), mtime)
+
+    def __resolve(self, abs_path):
+        """Where the content of abs_path is, the staged file when it was written in the active transaction"""
+        transaction = self.__transaction
+        return abs_path if transaction is None else transaction.resolve(abs_path)
+
+    def __stat_abs(self, abs_path):
+        cache = self.__stat_cache
+        if cache is None:
+            return self.__fs.stat(abs_path)
+        res = cache.get(abs_path, None)
+        if res is None:
+            res = cache[abs_path] = self.__fs.stat(abs_path)
+        return res
+
+    def stat_many(self, cpaths, workers=None):
+        """FsStat of every cpath (or path) as a dict in the order given. With workers > 1 the stats are done on a
+        thread pool of that many threads."""
+        keys = list(cpaths)
+        abs_paths = [self.__resolve(cpath.abs_path if type(cpath) is _CPath else self.get_full_path(cpath))
+                     for cpath in keys]
+        if workers is not None and workers > 1 and len(abs_paths) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                stats = list(executor.map(self.__stat_abs, abs_paths))
+        else:
+            stats = [self.__stat_abs(abs_path) for abs_path in abs_paths]
+        return dict(zip(keys, stats))
+
+    @contextlib.contextmanager
+    def stat_cache(self):
+        """Within this context stat() and stat_many() results are cached per path, for a build that must see
+        the tree as it was when it started. Can be nested, the cache is dropped when the outermost one exits."""
+        with self.__stat_cache_lock:
+            if self.__stat_cache_depth == 0:
+                self.__stat_cache = {}
+            self.__stat_cache_depth += 1
+        try:
+            yield self
+        finally:
+            with self.__stat_cache_lock:
+                self.__stat_cache_depth -= 1
+                if self.__stat_cache_depth == 0:
+                    self.__stat_cache = None
+
+    def fingerprint(self, *path):
+        """Hex digest of the content of a file"""
+        comps = self.to_cpath_ccomps(*path)
+        return self.__fingerprints([self.__full_path__(comps)])[0]
+
+    def fingerprint_many(self, cpaths, processes=None):
+        """Digests of the files (cpaths or paths) as a dict in the order given. With processes > 1 the files are hashed
+        on a process pool of that many processes, on the real file system backend only (others hash in this one)."""
+        keys = list(cpaths)
+        abs_paths = [cpath.abs_path if type(cpath) is _CPath else self.get_full_path(cpath) for cpath in keys]
+        return dict(zip(keys, self.__fingerprints(abs_paths, processes)))
+
+    def __hash_abs(self, abs_path):
+        with self.__fs.open(abs_path, 'rb') as fr:
+            return hash_stream(fr)
+
+    def __fingerprints(self, abs_paths, processes=None):
+        cache = self.__fingerprint_cache
+        digests = [None] * len(abs_paths)
+        stats = None
+        if cache is not None:
+            stats = [self.__stat_abs(abs_path) for abs_path in abs_paths]
+            for idx, abs_path in enumerate(abs_paths):
+                digests[idx] = cache.get(abs_path, stats[idx])
+
+        missing = [idx for idx, digest in enumerate(digests) if digest is None]
+        missing_paths = [abs_paths[idx] for idx in missing]
+        if processes is not None and processes > 1 and len(missing) > 1 and type(self.__fs) is FileSystemBackend:
+            hashed = []
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                chunksize = max(1, len(missing) // (processes * 4))
+                try:
+                    for digest in executor.map(_hash_file, missing_paths, chunksize=chunksize):
+                        hashed.append(digest)
+                except (OSError, IOError) as e:
+                    raise PathTreeError(
+                        f'Synamic File System Error (occurred during hashing path: {missing_paths[len(hashed)]}):\n'
+                        f'{str(e)}'
+                    )
+        else:
+            hashed = [self.__hash_abs(abs_path) for abs_path in missing_paths]
+
+        for idx, digest in zip(missing, hashed):
+            digests[idx] = digest
+            if cache is not None:
+                cache.put(abs_paths[idx], stats[idx], digest)
+        return digests
+
+    def merkle_digests(self, initial_path_comps=(), respect_settings=True, patterns=None, processes=None):
+        """Digest of every directory under initial_path_comps (and of itself) as a dict of dir cpath -> hex digest,
+        made of the names and digests of its entries. A directory with the same digest as before has the same content
+        under it, so unchanged subtrees are skipped with one comparison."""
+        if type(initial_path_comps) is _CPath:
+            start = initial_path_comps
+        else:
+            start = self.create_cpath(initial_path_comps, is_file=False)
+        dirs, files = self.list_cpaths(start, respect_settings=respect_settings, patterns=patterns)
+        file_digests = self.fingerprint_many(files, processes=processes)
+
+        def parent_key(cpath):
+            return cpath.path_comps[:-1] or ('', )
+
+        children = {start.path_comps: []}
+        for cpath in dirs:
+            children[cpath.path_comps] = []
+        for cpath, digest in file_digests.items():
+            children[parent_key(cpath)].append((cpath.basename, True, digest))
+
+        digests = {}
+        # deepest first, so the entries of a directory are done before it
+        for cpath in sorted(dirs, key=lambda c: len(c.path_comps), reverse=True):
+            digest = digests[cpath] = merkle_digest(children[cpath.path_comps])
+            children[parent_key(cpath)].append((cpath.basename, False, digest))
+        return {start: merkle_digest(children[start.path_comps]), **digests}
+
     def join(self, *content_paths, is_file=False, forgiving=False):
         comps = self.to_cpath_ccomps(*content_paths)
         return self.create_cpath(comps, is_file=is_file, forgiving=forgiving)
@@ -209,11 +468,70 @@ class PathTree(object):
     def open(self, file_path, *args, **kwargs):
         comps = self.to_cpath_ccomps(file_path)
         fn = self.__full_path__(comps)
-        return open(fn, *args, **kwargs)
+        transaction = self.__transaction
+        if transaction is not None:
+            return transaction.open(fn, *args, **kwargs)
+        return self.__fs.open(fn, *args, **kwargs)
+
+    @property
+    def active_transaction(self):
+        return self.__transaction
+
+    @contextlib.contextmanager
+    def transaction(self, durable=True):
+        """Within this context files opened for writing (write_text(), write_bytes(), make_file(), ...) are staged
+        under the root and makedirs() is deferred. On a clean exit the staged files are fsynced in one batch (unless
+        durable is False) and each replaces its target atomically; on an error nothing is published. Reads, mmap(),
+        exists(), is_file(), is_dir(), stat() and stat_many() see the staged files and deferred directories (these have
+        no stat until the commit), walks see the tree as it is. Nested ones join the outermost: an error out of a
+        nested one makes the outermost roll back on exit (raising PathTreeError if the error was caught in between).
+        Needs the real file system backend, FileSystemRedirectBackend has commit()/discard() for others."""
+        assert isinstance(self.__fs, FileSystemBackend), 'Transactions need the real file system backend'
+        with self.__transaction_lock:
+            if self.__transaction_depth == 0:
+                self.__transaction = Transaction(self, durable=durable)
+            self.__transaction_depth += 1
+            transaction = self.__transaction
+        try:
+            yield transaction
+        except BaseException:
+            with self.__transaction_lock:
+                self.__transaction_depth -= 1
+                outermost = self.__transaction_depth == 0
+                if outermost:
+                    self.__transaction = None
+            if outermost:
+                transaction.rollback()
+            else:
+                # what the nested one left half done must not be published, the outermost one is still writing
+                transaction.mark_rollback_only()
+            raise
+        else:
+            with self.__transaction_lock:
+                self.__transaction_depth -= 1
+                outermost = self.__transaction_depth == 0
+                if outermost:
+                    self.__transaction = None
+            if outermost:
+                if transaction.rollback_only:
+                    transaction.rollback()
+                    raise PathTreeError(f'Transaction rolled back, a nested transaction of it failed: '
+                                        f'{transaction.staging_path}')
+                transaction.commit()
+
+    def mmap(self, *path):
+        """Read only memory map of the whole content of a file under the root, memoryview(it) slices it without
+        copying. Backends that cannot map files give a read only buffer (memoryview) of the content instead."""
+        comps = self.to_cpath_ccomps(*path)
+        return self.__fs.mmap(self.__resolve(self.__full_path__(comps)))
 
     def makedirs(self, *dir_path):
         comps = self.to_cpath_ccomps(*dir_path)
         full_p = self.__full_path__(comps)
+        transaction = self.__transaction
+        if transaction is not None:
+            transaction.makedirs(full_p)
+            return
         self.__fs.makedirs(full_p)
 
     @staticmethod
@@ -245,18 +563,7 @@ class PathTree(object):
         """Comma separated arguments of path components or os.sep separated paths"""
         return self.join_comps(self.__host.abs_root_path, *comps)
 
-    def __list_cpaths_loop2(self, starting_comps=(), files_only=None, directories_only=None, depth=None, exclude_cpaths=(), checker=None, respect_settings=True):
-        return self.__ListCPathsLoop(
-            self,
-            starting_comps=starting_comps,
-            files_only=files_only,
-            directories_only=directories_only,
-            depth=depth,
-            exclude_cpaths=exclude_cpaths,
-            checker=checker,
-            respect_settings=respect_settings)()
-
-    def list_cpaths(self, initial_path_comps=(), files_only=None, directories_only=None, depth=None, exclude_compss=(), checker=None, respect_settings=True):
+    def __list_cpaths_loop(self, initial_path_comps=(), files_only=None, directories_only=None, depth=None, exclude_compss=(), checker=None, respect_settings=True, workers=None, ordered=True, patterns=None, processes=None, scandir=None):
         if type(initial_path_comps) is _CPath:
             assert initial_path_comps.is_dir
             starting_comps = initial_path_comps.path_comps
@@ -265,42 +572,212 @@ class PathTree(object):
         _exclude_compss = []
         for pc in exclude_compss:
             _exclude_compss.append(self.to_cpath_ccomps(pc))
+        if self.__transaction is not None:
+            # the staging directory
+            _exclude_compss.append(self.to_cpath_ccomps(self.__transaction.staging_name))
         exclude_compss = tuple(_exclude_compss)
 
-        dirs, files = self.__list_cpaths_loop2(starting_comps, files_only=files_only, directories_only=directories_only, depth=depth, exclude_cpaths=exclude_compss, checker=checker, respect_settings=respect_settings)
+        return self.__ListCPathsLoop(
+            self,
+            starting_comps=starting_comps,
+            files_only=files_only,
+            directories_only=directories_only,
+            depth=depth,
+            exclude_cpaths=exclude_compss,
+            checker=checker,
+            respect_settings=respect_settings,
+            workers=workers,
+            ordered=ordered,
+            patterns=patterns,
+            processes=processes,
+            scandir=scandir)
+
+    def list_cpaths(self, initial_path_comps=(), files_only=None, directories_only=None, depth=None, exclude_compss=(), checker=None, respect_settings=True, workers=None, ordered=True, patterns=None, processes=None):
+        dirs, files = self.__list_cpaths_loop(initial_path_comps, files_only=files_only, directories_only=directories_only, depth=depth, exclude_compss=exclude_compss, checker=checker, respect_settings=respect_settings, workers=workers, ordered=ordered, patterns=patterns, processes=processes)()
         return dirs, files
 
-    def list_file_cpaths(self, initial_path_comps=(), depth=None, exclude_compss=(), checker=None, respect_settings=True):
-        _, files = self.list_cpaths(initial_path_comps, files_only=True, depth=depth, exclude_compss=exclude_compss, checker=checker, respect_settings=respect_settings)
+    def list_file_cpaths(self, initial_path_comps=(), depth=None, exclude_compss=(), checker=None, respect_settings=True, workers=None, ordered=True, patterns=None, processes=None):
+        _, files = self.list_cpaths(initial_path_comps, files_only=True, depth=depth, exclude_compss=exclude_compss, checker=checker, respect_settings=respect_settings, workers=workers, ordered=ordered, patterns=patterns, processes=processes)
         return files
 
-    def list_dir_cpaths(self, initial_path_comps='', depth=None, exclude_compss=(), checker=None, respect_settings=True):
-        dirs, _ = self.list_cpaths(initial_path_comps, directories_only=True, depth=depth, exclude_compss=exclude_compss, checker=checker, respect_settings=respect_settings)
+    def list_dir_cpaths(self, initial_path_comps='', depth=None, exclude_compss=(), checker=None, respect_settings=True, workers=None, ordered=True, patterns=None, processes=None):
+        dirs, _ = self.list_cpaths(initial_path_comps, directories_only=True, depth=depth, exclude_compss=exclude_compss, checker=checker, respect_settings=respect_settings, workers=workers, ordered=ordered, patterns=patterns, processes=processes)
         return dirs
 
+    def collect_cpaths(self, initial_path_comps=(), files_only=None, directories_only=None, depth=None, exclude_compss=(), checker=None, respect_settings=True, workers=None, ordered=True, patterns=None, processes=None):
+        """Same walk as list_cpaths() with the result as one CPathCollection of directories and files: paths in a shared
+        string table and integer arrays instead of a cpath object each, with filters (files(), with_extension(),
+        with_depth(), under()) and sorted() that do not make cpaths. Cpaths are made on demand when it is iterated."""
+        return CPathCollection.from_cpaths(self, self.__list_cpaths_loop(initial_path_comps, files_only=files_only, directories_only=directories_only, depth=depth, exclude_compss=exclude_compss, checker=checker, respect_settings=respect_settings, workers=workers, ordered=ordered, patterns=patterns, processes=processes))
+
+    def iter_cpaths(self, initial_path_comps=(), files_only=None, directories_only=None, depth=None, exclude_compss=(), checker=None, respect_settings=True, workers=None, ordered=True, patterns=None, processes=None):
+        """Lazy variant of list_cpaths(): yields the cpaths in the same order as they are found, directories and files
+        mixed. Nothing is listed before the first next() and stopping the iteration stops the walk.
+        :workers: when more than 1, directories are listed concurrently on a thread pool of that many threads (for
+            slow or network mounts where listing is mostly waiting). Depth, ignore settings, checker and exclusions
+            are applied the same way.
+        :ordered: with workers, yield in the same order as the sequential walk. When False, entries of whichever
+            directory is listed first are yielded first.
+        :patterns: a PatternSet, entries are matched by their relative path before any cpath is made for them and
+            directories that are excluded or cannot contain included files are not walked into.
+        :processes: when more than 1 (on FileSystemBackend itself, without an attached index), every directory of the
+            first level is walked in one of a pool of that many processes, which send back names only; cpaths are made
+            here as they are yielded. Other backends and indexed trees are walked as with workers (or sequentially).
+            Cpaths of a directory come together, in the order of the first level with ordered and as they
+            are done without it. A checker is applied here, so it does not need to be picklable.
+        :checker: a callable on cpaths or a FilterPipeline, whose name and stat stages are applied on the entries of
+            the listings before any cpath is made for them."""
+        return iter(self.__list_cpaths_loop(initial_path_comps, files_only=files_only, directories_only=directories_only, depth=depth, exclude_compss=exclude_compss, checker=checker, respect_settings=respect_settings, workers=workers, ordered=ordered, patterns=patterns, processes=processes))
+
+    def iter_file_cpaths(self, initial_path_comps=(), depth=None, exclude_compss=(), checker=None, respect_settings=True, workers=None, ordered=True, patterns=None, processes=None):
+        for cpath in self.iter_cpaths(initial_path_comps, files_only=True, depth=depth, exclude_compss=exclude_compss, checker=checker, respect_settings=respect_settings, workers=workers, ordered=ordered, patterns=patterns, processes=processes):
+            if cpath.is_file:
+                yield cpath
+
+    def iter_dir_cpaths(self, initial_path_comps='', depth=None, exclude_compss=(), checker=None, respect_settings=True, workers=None, ordered=True, patterns=None, processes=None):
+        for cpath in self.iter_cpaths(initial_path_comps, directories_only=True, depth=depth, exclude_compss=exclude_compss, checker=checker, respect_settings=respect_settings, workers=workers, ordered=ordered, patterns=patterns, processes=processes):
+            if cpath.is_dir:
+                yield cpath
+
+    def top_files(self, initial_path_comps=(), k=50, key=None, largest=True, depth=None, exclude_compss=(),
+                  checker=None, respect_settings=True, workers=None, patterns=None):
+        """The k files under initial_path_comps with the largest (smallest when largest is False) key(FsStat) as
+        (cpath, FsStat) pairs, best first. Found during the walk with the stat data of the listing entries (one stat per
+        file at most, none again later) and a heap of k items, so nothing else of the walk is kept."""
+        assert k >= 0
+        if key is None:
+            def key(fs_stat):
+                return fs_stat.mtime
+        sign = 1 if largest else -1
+        stat_entry = self.__fs.stat_entry
+        loop = self.__list_cpaths_loop(initial_path_comps, files_only=True, depth=depth, exclude_compss=exclude_compss,
+                                       checker=checker, respect_settings=respect_settings, workers=workers,
+                                       patterns=patterns)
+        heap = []
+        found = 0
+        for cpath, entry in loop.iter_entries():
+            if not cpath.is_file or k == 0:
+                continue
+            fs_stat = stat_entry(entry)
+            # on equal keys the one found first wins
+            item = (sign * key(fs_stat), -found, cpath, fs_stat)
+            found += 1
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+        heap.sort(key=lambda i: i[:2], reverse=True)
+        return [(cpath, fs_stat) for _, _, cpath, fs_stat in heap]
+
+    def newest_files(self, initial_path_comps=(), k=50, **kwargs):
+        """The k most recently modified files, see top_files()"""
+        return self.top_files(initial_path_comps, k, key=lambda fs_stat: fs_stat.mtime, largest=True, **kwargs)
+
+    def oldest_files(self, initial_path_comps=(), k=50, **kwargs):
+        return self.top_files(initial_path_comps, k, key=lambda fs_stat: fs_stat.mtime, largest=False, **kwargs)
+
+    def largest_files(self, initial_path_comps=(), k=50, **kwargs):
+        return self.top_files(initial_path_comps, k, key=lambda fs_stat: fs_stat.size, largest=True, **kwargs)
+
+    def du(self, initial_path_comps=(), depth=None, exclude_compss=(), checker=None, respect_settings=True,
+           workers=None, patterns=None, use_cache=False):
+        """Disk usage: TreeStats (files, dirs, bytes, extensions) of the directory and of every directory at most depth
+        levels under it (all when None) as a dict of dir cpath -> TreeStats, the directory first. Made in one walk with
+        the stat data of the listing entries.
+        :use_cache: reuse listings and file stats of directories whose mtime did not change since an earlier du() with
+            it, so a repeated call stats each directory only. Files that were written into without their directory
+            changing keep their old size until clear_du_cache()."""
+        if type(initial_path_comps) is _CPath:
+            start = initial_path_comps
+        else:
+            start = self.create_cpath(initial_path_comps, is_file=False)
+        scandir = None
+        if use_cache:
+            if self.__du_index is None:
+                self.__du_index = TreeIndex(self, with_stats=True)
+            scandir = self.__du_index.scandir
+        loop = self.__list_cpaths_loop(start, depth=None, exclude_compss=exclude_compss, checker=checker,
+                                       respect_settings=respect_settings, workers=workers, patterns=patterns,
+                                       scandir=scandir)
+        start_comps = () if start.path_comps == ('', ) else start.path_comps
+        return disk_usage(self, loop, start_comps, 65535 if depth is None else depth)
+
+    def clear_du_cache(self):
+        if self.__du_index is not None:
+            self.__du_index.clear()
+
+    def sync_to(self, other, initial_path_comps=(), compare='mtime', delete=False, workers=None, respect_settings=True,
+                patterns=None):
+        """Mirrors the files under initial_path_comps into the same place of the path tree other and returns a
+        SyncReport. Missing directories are created first in one batch, then the files that are missing or differ
+        (by size and mtime, or by size and content digest with compare='hash') are copied, on a pool of workers
+        threads when workers > 1 and in the kernel between regular files. Copies get the mtime of their source, so
+        with compare='mtime' a file differs when its mtime is not the same (older or newer). With delete the files of
+        other under it that are not in this one are removed; directories are left in place."""
+        assert isinstance(other, PathTree)
+        return sync_trees(self, other, initial_path_comps, compare=compare, delete=delete, workers=workers,
+                          respect_settings=respect_settings, patterns=patterns)
+
+    def watch(self, initial_path_comps=(), debounce=0.05, respect_settings=True, polling=None, poll_interval=1.0,
+              max_latency=1.0):
+        """Returns a PathTreeWatcher that reports changes under initial_path_comps as events with cpaths, see
+        PyPathTree.watcher"""
+        return PathTreeWatcher(self, initial_path_comps, debounce=debounce, respect_settings=respect_settings,
+                               polling=polling, poll_interval=poll_interval, max_latency=max_latency)
+
     def is_type_cpath(self, other):
         return type(other) is _CPath
 
     def __set_fs__(self, fs_instance):
         assert isinstance(fs_instance, BaseFsBackendContract)
         self.__fs = fs_instance
+        if self.__index is not None:
+            # listings of the old backend
+            self.__index.clear()
+        if self.__model is not None:
+            self.__model.invalidate()
+        if self.__fingerprint_cache is not None:
+            self.__fingerprint_cache.clear()
+        if self.__du_index is not None:
+            self.__du_index.clear()
 
     class __ListCPathsLoop:
-        def __init__(self, path_tree, starting_comps=(), files_only=None, directories_only=None, depth=None, exclude_cpaths=None, checker=None, respect_settings=True):
+        def __init__(self, path_tree, starting_comps=(), files_only=None, directories_only=None, depth=None, exclude_cpaths=None, checker=None, respect_settings=True, workers=None, ordered=True, patterns=None, processes=None, scandir=None):
             self.path_tree = path_tree
             self.starting_comps = None
             self.files_only = files_only
             self.directories_only = directories_only
             self.depth = depth
-            self.exclude_cpaths = None
+            self.exclude_trie = None
             self.checker = checker
             self.respect_settings = respect_settings
+            self.workers = workers
+            self.ordered = ordered
+            self.patterns = patterns
+            self.processes = processes
+            # listing function used instead of the one of the backend (or the index)
+            self.scandir = scandir
+            # a FilterPipeline checker gets its name and stat stages applied on the listing entries, before cpaths
+            # are made, and only its cpath stage on the cpaths
+            self.__filters = None
+            self.__cpath_checker = checker
+            if isinstance(checker, FilterPipeline):
+                self.__filters = checker
+                self.__cpath_checker = checker.check_cpath if checker.has_cpath_stage else None
 
             if starting_comps is None:
                 self.starting_comps = ()
             else:
                 self.starting_comps = self.path_tree.to_path_comps(starting_comps)
+            if self.starting_comps == ('', ):
+                # the root, so that the comps of the entries are their relative path comps
+                self.starting_comps = ()
+
+            assert patterns is None or isinstance(patterns, PatternSet), \
+                f"patterns must be a PatternSet, {type(patterns)} found"
 
+            if exclude_cpaths is None:
+                exclude_cpaths = ()
             for exclude_comps in exclude_cpaths:
                 assert type(exclude_comps) is tuple, f"exclude_cpaths must contain tuple of strings as path." \
                                                      f" {exclude_comps} found"
@@ -317,82 +794,260 @@ class PathTree(object):
             if depth is None:
                 self.depth = 2147483647
 
-            # exclude cpaths validation
-            _ = set()
-            if exclude_cpaths is None:
-                exclude_cpaths = set()
-            for exclude_cpath in exclude_cpaths:
-                assert self.path_tree.is_type_cpath(exclude_cpath)
-                _.add(exclude_cpath)
-            else:
-                self.exclude_cpaths = _
+            # workers
+            assert isinstance(workers, (type(None), int)), f"Type of workers must be None or int, {type(workers)}" \
+                                                           f" found with value {workers}"
+            assert isinstance(processes, (type(None), int)), f"Type of processes must be None or int," \
+                                                             f" {type(processes)} found with value {processes}"
+
+            # excluded paths as a trie of their root relative comps, the walker follows it along with the
+            # directories so that nothing under an excluded one is listed or turned into a cpath
+            self.exclude_trie = self.__make_exclude_trie(
+                self.path_tree.to_path_comps(exclude_comps) for exclude_comps in exclude_cpaths)
+            self.__exclude_start = self.__exclude_trie_node(self.exclude_trie, self.starting_comps)
 
             # default configs
             _dc = self.path_tree.host.system_settings['configs']
             self.__ignore_dirs_sw = tuple(_dc.get('ignore_dirs_sw', tuple()))
             self.__ignore_files_sw = tuple(_dc.get('ignore_files_sw', tuple()))
 
+        @staticmethod
+        def __make_exclude_trie(exclude_compss):
+            """Nested dicts keyed by path comp, an excluded path ends in True"""
+            trie = {}
+            for comps in exclude_compss:
+                if comps == ('', ):
+                    # the root itself
+                    return True
+                node = trie
+                for comp in comps[:-1]:
+                    node = node.setdefault(comp, {})
+                    if node is True:
+                        # a parent of it is excluded already
+                        break
+                else:
+                    node[comps[-1]] = True
+            return trie
+
+        @staticmethod
+        def __exclude_trie_node(trie, comps):
+            """The trie node of a directory: True when it is excluded, None when nothing under it is"""
+            node = trie
+            for comp in comps:
+                if node is True or node is None:
+                    break
+                node = node.get(comp)
+            return node if node else None
+
         def __call__(self, *args, **kwargs):
+            directories = []
+            files = []
+            for path_obj in self:
+                if path_obj.is_file:
+                    files.append(path_obj)
+                else:
+                    directories.append(path_obj)
+            return directories, files
+
+        def __iter__(self):
             """
-                    A function to get all paths recursively starting from abs_root but returns a list of paths relative to the
+                    A generator to get all paths recursively starting from abs_root but yields paths relative to the
                     .root
-                    prefix_relative_root is fixed on every recursion
-                    BUT next_relative_root isn't
+                    Only the directories that are not listed yet are kept in the queue, entries of a directory are
+                    checked and yielded as soon as it is listed.
 
                     exclude_comps_tuples: *components* list that are excluded from listing
                     checker: callables that accepts parameters: __ContentPath2 instance.
                     """
-            absolute_root = self.path_tree.__full_path__(self.starting_comps)
-            assert self.path_tree.fs.exists(absolute_root), f"Absolute root must exist: {absolute_root}"
+            return self.__iterate(with_entries=False)
 
-            # new
-            to_travel = deque([((*self.starting_comps, comp), 1) for comp in self.path_tree.fs.listdir(absolute_root)])
-            directories = []
-            files = []
+        def iter_entries(self):
+            """(cpath, entry) pairs, the entry being the one of the listing (with its cached stat data) that the cpath
+            was made of. Never sharded, the entries of worker processes do not come back."""
+            return self.__iterate(with_entries=True)
+
+        def __iterate(self, with_entries):
+            absolute_root = self.path_tree.__full_path__(self.starting_comps)
+            fs = self.path_tree.fs
+            assert fs.exists(absolute_root), f"Absolute root must exist: {absolute_root}"
+            scandir = fs.scandir if self.path_tree.index is None else self.path_tree.index.scandir
+            if self.scandir is not None:
+                scandir = self.scandir
+            if self.__exclude_start is True:
+                # a generator like the walks, so that it can be closed
+                return (path_obj for path_obj in ())
+
+            # the workers list with os.scandir(): only for the real file system backend itself (not subclasses of it)
+            # and when nothing else (an index, an override) is to do the listing, the threads or a sequential walk
+            # do it otherwise
+            if self.processes is not None and self.processes > 1 and type(fs) is FileSystemBackend and \
+                    self.path_tree.index is None and self.scandir is None and not with_entries:
+                return self.__walk_sharded(scandir, absolute_root)
+            if self.workers is not None and self.workers > 1:
+                return self.__walk_parallel(scandir, absolute_root, with_entries)
+            return self.__walk(scandir, absolute_root, with_entries)
+
+        def __walk(self, scandir, absolute_root, with_entries=False):
+            # entries from scandir already know whether they are file or dir and their absolute path, so no more stat
+            # or join is needed for them.
+            to_travel = deque([(self.starting_comps, absolute_root, 1, self.__exclude_start)])
 
             while len(to_travel) != 0:
-                path_comps_n_depth = to_travel.popleft()
-                path_comps = path_comps_n_depth[0]
-                path_depth = path_comps_n_depth[1]
+                dir_comps, dir_abs, path_depth, exclude_node = to_travel.popleft()
                 if path_depth > self.depth:
                     break
-                path_base = path_comps[-1]
-                path_abs = self.path_tree.__full_path__(path_comps)
-
-                if self.path_tree.fs.is_file(path_abs) and (self.files_only in (True, None)):
-                    move_in = True
-                    path_obj = self.path_tree.create_cpath(path_comps, is_file=True)
-                    if self.checker is not None and not self.checker(path_obj):
-                        move_in = False
-
-                    elif self.respect_settings and path_base.startswith(self.__ignore_files_sw):
-                        move_in = False
-
-                    elif path_obj in self.exclude_cpaths:
-                        move_in = False
-
-                    if move_in:
-                        files.append(path_obj)
-
-                elif self.path_tree.fs.is_dir(path_abs) and (self.directories_only in (True, None)):
-                    path_obj = self.path_tree.create_cpath(path_comps, is_file=False)
-                    move_in = True
-                    if self.checker is not None and not self.checker(path_obj):
-                        move_in = False
 
-                    elif self.respect_settings and path_base.startswith(self.__ignore_dirs_sw):
-                        move_in = False
-
-                    elif path_obj in self.exclude_cpaths:
-                        move_in = False
-
-                    if move_in:
-                        directories.append(path_obj)
-                        # Recurse
-                        to_travel.extend(
-                            tuple([((*path_comps, comp), path_depth + 1) for comp in self.path_tree.fs.listdir(path_abs)]))
+                for entry in scandir(dir_abs):
+                    entry_exclude_node = None
+                    if exclude_node is not None:
+                        entry_exclude_node = exclude_node.get(entry.name)
+                        if entry_exclude_node is True:
+                            continue
+                    path_comps = (*dir_comps, entry.name)
+                    path_obj = self.__check_entry(path_comps, entry)
+                    if path_obj is not None:
+                        yield (path_obj, entry) if with_entries else path_obj
+                        if path_obj.is_dir:
+                            # Recurse
+                            to_travel.append((path_comps, entry.path, path_depth + 1, entry_exclude_node))
+
+        def __walk_parallel(self, scandir, absolute_root, with_entries=False):
+            # Listing is done on the pool, checking entries and creating cpaths stay on this thread. Only a few
+            # listings per worker are kept in flight so that memory does not grow with the frontier.
+            if self.depth < 1:
+                return
+            max_in_flight = self.workers * 2
+            executor = ThreadPoolExecutor(max_workers=self.workers)
+            to_travel = deque([(self.starting_comps, absolute_root, 1, self.__exclude_start)])
+            in_flight = {}
+            in_flight_order = deque()
+            try:
+                while len(to_travel) != 0 or len(in_flight) != 0:
+                    while len(to_travel) != 0 and len(in_flight) < max_in_flight:
+                        dir_comps, dir_abs, path_depth, exclude_node = to_travel.popleft()
+                        future = executor.submit(scandir, dir_abs)
+                        in_flight[future] = (dir_comps, path_depth, exclude_node)
+                        if self.ordered:
+                            in_flight_order.append(future)
+
+                    if self.ordered:
+                        done = (in_flight_order.popleft(), )
+                    else:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        dir_comps, path_depth, exclude_node = in_flight.pop(future)
+                        for entry in future.result():
+                            entry_exclude_node = None
+                            if exclude_node is not None:
+                                entry_exclude_node = exclude_node.get(entry.name)
+                                if entry_exclude_node is True:
+                                    continue
+                            path_comps = (*dir_comps, entry.name)
+                            path_obj = self.__check_entry(path_comps, entry)
+                            if path_obj is not None:
+                                yield (path_obj, entry) if with_entries else path_obj
+                                if path_obj.is_dir and path_depth + 1 <= self.depth:
+                                    to_travel.append((path_comps, entry.path, path_depth + 1, entry_exclude_node))
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        def __walk_sharded(self, scandir, absolute_root):
+            # The first level is listed and checked here, each directory of it is a shard walked by a worker process.
+            if self.depth < 1:
+                return
+            shards = []
+            for entry in scandir(absolute_root):
+                entry_exclude_node = None
+                if self.__exclude_start is not None:
+                    entry_exclude_node = self.__exclude_start.get(entry.name)
+                    if entry_exclude_node is True:
+                        continue
+                path_comps = (*self.starting_comps, entry.name)
+                path_obj = self.__check_entry(path_comps, entry)
+                if path_obj is not None:
+                    yield path_obj
+                    if path_obj.is_dir and self.depth >= 2:
+                        shards.append((path_comps, entry.path, entry_exclude_node))
+            if len(shards) == 0:
+                return
+
+            executor = ProcessPoolExecutor(max_workers=min(self.processes, len(shards)))
+            done = False
+            try:
+                futures = {}
+                for path_comps, dir_abs, exclude_node in shards:
+                    future = executor.submit(
+                        scan_shard, dir_abs, '/'.join(path_comps), exclude_node, 2, self.depth, self.files_only,
+                        self.directories_only, self.respect_settings, self.__ignore_dirs_sw, self.__ignore_files_sw,
+                        self.patterns)
+                    futures[future] = path_comps
+                for future in (futures if self.ordered else as_completed(futures)):
+                    yield from self.__rehydrate(futures[future], *future.result())
+                done = True
+            finally:
+                # a complete walk waits for the pool to wind down, so that nothing of it is left for interpreter exit;
+                # a walk closed early (or failed) drops the shards that are not done
+                if done:
+                    executor.shutdown(wait=True)
                 else:
-                    raise Exception(f"ContentPath is neither dir, nor file: {path_abs}. Files only: {self.files_only} "
-                                    f"Dirs only: {self.directories_only}. ")
-            return directories, files
+                    executor.shutdown(wait=False, cancel_futures=True)
+
+        def __rehydrate(self, shard_comps, names, parents, kinds):
+            """Cpaths of the arrays of a shard, skipping what the checker rejects and everything under it (all stages of a
+            FilterPipeline are applied on the cpaths here)"""
+            create_cpath = self.path_tree.create_cpath
+            checker = self.checker
+            # comps of the directories, None for files and rejected directories
+            dir_comps = [None] * len(names)
+            for idx, name in enumerate(names):
+                parent_idx = parents[idx]
+                parent_comps = shard_comps if parent_idx < 0 else dir_comps[parent_idx]
+                if parent_comps is None:
+                    continue
+                path_comps = (*parent_comps, name)
+                is_file = kinds[idx] == 1
+                path_obj = create_cpath(path_comps, is_file=is_file)
+                if checker is not None and not checker(path_obj):
+                    continue
+                if not is_file:
+                    dir_comps[idx] = path_comps
+                yield path_obj
+
+        def __check_entry(self, path_comps, entry):
+            """Returns the cpath of the entry if it is to be listed (and moved into for directories), None otherwise"""
+            path_base = entry.name
+
+            if entry.is_file() and (self.files_only in (True, None)):
+                if self.patterns is not None and not self.patterns.match_file('/'.join(path_comps), path_base):
+                    return None
+                if self.__filters is not None and \
+                        not self.__filters.check_entry(entry, True, self.path_tree.fs.stat_entry):
+                    return None
+                move_in = True
+                path_obj = self.path_tree.create_cpath(path_comps, is_file=True)
+                if self.__cpath_checker is not None and not self.__cpath_checker(path_obj):
+                    move_in = False
+
+                elif self.respect_settings and path_base.startswith(self.__ignore_files_sw):
+                    move_in = False
+
+            elif entry.is_dir() and (self.directories_only in (True, None)):
+                if self.patterns is not None and not self.patterns.match_dir('/'.join(path_comps), path_base):
+                    return None
+                if self.__filters is not None and \
+                        not self.__filters.check_entry(entry, False, self.path_tree.fs.stat_entry):
+                    return None
+                path_obj = self.path_tree.create_cpath(path_comps, is_file=False)
+                move_in = True
+                if self.__cpath_checker is not None and not self.__cpath_checker(path_obj):
+                    move_in = False
+
+                elif self.respect_settings and path_base.startswith(self.__ignore_dirs_sw):
+                    move_in = False
+            else:
+                raise Exception(f"ContentPath is neither dir, nor file: {entry.path}. Files only: {self.files_only} "
+                                f"Dirs only: {self.directories_only}. ")
+
+            return path_obj if move_in else None
 
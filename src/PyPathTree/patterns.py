@@ -0,0 +1,149 @@
+import re
+import functools
+
+regex_type = type(re.compile(""))
+
+
+class _Patterns:
+    glob_special = re.compile(r'[*?\[]')
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_regex(regex, ignorecase=True):
+    return re.compile(regex, re.IGNORECASE if ignorecase else 0)
+
+
+def glob_to_regex(glob):
+    """
+    Regular expression (string) for a glob over '/' separated relative paths:
+    `**` matches any number of components (`a/**/b`, `**/*.md`, `build/**`), `*` and `?` never match '/' and
+    `[...]` / `[!...]` are character classes.
+    """
+    res = []
+    i = 0
+    n = len(glob)
+    while i < n:
+        c = glob[i]
+        if glob.startswith('**/', i):
+            res.append('(?:.*/)?')
+            i += 3
+        elif glob.startswith('/**', i) and i + 3 == n:
+            res.append('(?:/.*)?')
+            i += 3
+        elif glob.startswith('**', i):
+            res.append('.*')
+            i += 2
+        elif c == '*':
+            res.append('[^/]*')
+            i += 1
+        elif c == '?':
+            res.append('[^/]')
+            i += 1
+        elif c == '[':
+            end = glob.find(']', i + 2 if glob.startswith('[!', i) else i + 1)
+            if end == -1:
+                res.append(re.escape(c))
+                i += 1
+            else:
+                chars = glob[i + 1:end]
+                if chars.startswith('!'):
+                    chars = '^' + chars[1:]
+                res.append('[' + chars.replace('\\', '\\\\') + ']')
+                i = end + 1
+        else:
+            res.append(re.escape(c))
+            i += 1
+    return ''.join(res)
+
+
+class PatternSet(object):
+    """
+    Compiled include/exclude patterns for walks and cpaths.
+    Patterns are globs (see glob_to_regex()) or compiled regular expressions. Globs without a '/' match the base
+    name at any depth (`*.md`, `node_modules`), the others and regular expressions match the whole path relative to
+    the root (`posts/**/*.md`), without leading slash.
+    Files must match one of the include patterns (when there are any) and none of the exclude ones. Directories
+    that match an exclude pattern are not listed nor walked into, and directories that cannot contain anything the
+    include patterns match are skipped too.
+    """
+    def __init__(self, include=(), exclude=(), ignorecase=False):
+        if isinstance(include, (str, regex_type)):
+            include = (include, )
+        if isinstance(exclude, (str, regex_type)):
+            exclude = (exclude, )
+        self.__ignorecase = ignorecase
+        self.__include_basename, self.__include_path = self.__compile(include)
+        self.__exclude_basename, self.__exclude_path = self.__compile(exclude)
+        self.__has_include = len(include) != 0
+
+        # (literal leading components, number of components or None with `**`) of the include patterns, None when
+        # one of them can match at any depth
+        prefixes = []
+        for pattern in include:
+            if type(pattern) is regex_type or '/' not in pattern:
+                prefixes = None
+                break
+            comps = pattern.split('/')
+            literal = []
+            for comp in comps:
+                if _Patterns.glob_special.search(comp):
+                    break
+                literal.append(comp.lower() if ignorecase else comp)
+            prefixes.append((tuple(literal), None if '**' in pattern else len(comps)))
+        self.__include_prefixes = prefixes
+
+    def __compile(self, patterns):
+        basename_regexes = []
+        path_regexes = []
+        for pattern in patterns:
+            if type(pattern) is regex_type:
+                path_regexes.append(f'(?:{pattern.pattern})')
+            else:
+                assert isinstance(pattern, str), f"Pattern must be a glob string or a compiled regex: {pattern}"
+                (path_regexes if '/' in pattern else basename_regexes).append(f'(?:{glob_to_regex(pattern)})')
+        flags = re.IGNORECASE if self.__ignorecase else 0
+        basename_regex = re.compile('|'.join(basename_regexes), flags) if basename_regexes else None
+        path_regex = re.compile('|'.join(path_regexes), flags) if path_regexes else None
+        return basename_regex, path_regex
+
+    @staticmethod
+    def __fullmatch(basename_regex, path_regex, relative_path, basename):
+        if basename_regex is not None and basename_regex.fullmatch(basename):
+            return True
+        if path_regex is not None and path_regex.fullmatch(relative_path):
+            return True
+        return False
+
+    def is_excluded(self, relative_path, basename=None):
+        if basename is None:
+            basename = relative_path.rpartition('/')[2]
+        return self.__fullmatch(self.__exclude_basename, self.__exclude_path, relative_path, basename)
+
+    def match_file(self, relative_path, basename=None):
+        if basename is None:
+            basename = relative_path.rpartition('/')[2]
+        if self.__has_include and \
+                not self.__fullmatch(self.__include_basename, self.__include_path, relative_path, basename):
+            return False
+        return not self.is_excluded(relative_path, basename)
+
+    def match_dir(self, relative_path, basename=None):
+        """Whether the directory is to be listed and walked into"""
+        if self.is_excluded(relative_path, basename):
+            return False
+        if self.__include_prefixes is None or not self.__has_include:
+            return True
+        comps = tuple(relative_path.lower().split('/') if self.__ignorecase else relative_path.split('/'))
+        for prefix, comps_count in self.__include_prefixes:
+            if comps_count is not None and len(comps) >= comps_count:
+                # too deep for the pattern to match anything inside
+                continue
+            n = min(len(prefix), len(comps))
+            if prefix[:n] == comps[:n]:
+                return True
+        return False
+
+    def match_cpath(self, cpath):
+        if cpath.is_file:
+            return self.match_file(cpath.id, cpath.basename)
+        return self.match_dir(cpath.id, cpath.basename)
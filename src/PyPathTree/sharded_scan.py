@@ -0,0 +1,61 @@
+import os
+from array import array
+from collections import deque
+from PyPathTree.exceptions import PathTreeError
+
+
+def scan_shard(shard_abs, shard_rel, exclude_node, shard_depth, max_depth, files_only, directories_only,
+               respect_settings, ignore_dirs_sw, ignore_files_sw, patterns):
+    """
+    Walks one directory of the tree in a worker process of PathTree.list_cpaths(processes=...), with the same depth,
+    ignore settings, patterns and exclusions as the walker (a checker needs cpaths, the parent applies it).
+    Returns compact arrays instead of cpaths: entry names, the index of the entry of their parent directory (-1 for the
+    shard directory itself) and 1/0 for file/directory, in breadth first order.
+    """
+    names = []
+    parents = array('l')
+    kinds = bytearray()
+    to_travel = deque([(-1, shard_abs, shard_rel, shard_depth, exclude_node)])
+    while len(to_travel) != 0:
+        parent_idx, dir_abs, dir_rel, path_depth, node = to_travel.popleft()
+        if path_depth > max_depth:
+            break
+        try:
+            with os.scandir(dir_abs) as it:
+                entries = list(it)
+        except (OSError, IOError) as e:
+            raise PathTreeError(
+                f'Synamic File System Error (occurred during scanning path: {dir_abs}):\n'
+                f'{str(e)}'
+            )
+
+        for entry in entries:
+            name = entry.name
+            entry_node = None
+            if node is not None:
+                entry_node = node.get(name)
+                if entry_node is True:
+                    continue
+            rel = dir_rel + '/' + name
+            if entry.is_file() and files_only in (True, None):
+                if patterns is not None and not patterns.match_file(rel, name):
+                    continue
+                if respect_settings and name.startswith(ignore_files_sw):
+                    continue
+                is_file = True
+            elif entry.is_dir() and directories_only in (True, None):
+                if patterns is not None and not patterns.match_dir(rel, name):
+                    continue
+                if respect_settings and name.startswith(ignore_dirs_sw):
+                    continue
+                is_file = False
+            else:
+                raise Exception(f"ContentPath is neither dir, nor file: {entry.path}. Files only: {files_only} "
+                                f"Dirs only: {directories_only}. ")
+
+            names.append(name)
+            parents.append(parent_idx)
+            kinds.append(is_file)
+            if not is_file:
+                to_travel.append((len(names) - 1, entry.path, rel, path_depth + 1, entry_node))
+    return names, parents, bytes(kinds)
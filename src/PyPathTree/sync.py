@@ -0,0 +1,101 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from PyPathTree.exceptions import PathTreeError
+from PyPathTree.transaction import _deepest_dirs
+
+COMPARE_MTIME = 'mtime'
+COMPARE_HASH = 'hash'
+# mtimes closer than this are the same, for the rounding of float seconds by the file systems
+MTIME_WINDOW = 1e-6
+
+
+class SyncReport(namedtuple('SyncReport', ('files_copied', 'bytes_copied', 'files_skipped', 'files_deleted',
+                                           'dirs_created', 'seconds'))):
+    """What PathTree.sync_to() did"""
+    __slots__ = ()
+
+    @property
+    def throughput(self):
+        """Bytes copied per second"""
+        return self.bytes_copied / self.seconds if self.seconds > 0 else 0.0
+
+
+def sync_trees(source, target, initial_path_comps=(), compare=COMPARE_MTIME, delete=False, workers=None,
+               respect_settings=True, patterns=None):
+    """See PathTree.sync_to()"""
+    assert compare in (COMPARE_MTIME, COMPARE_HASH), f'compare must be "mtime" or "hash", {compare} found'
+    started = time.perf_counter()
+
+    start = source.create_cpath(initial_path_comps, is_file=False)
+    src_dirs, src_files = source.list_cpaths(start, respect_settings=respect_settings, patterns=patterns)
+    target_start = target.create_cpath(start.path_comps, is_file=False)
+
+    # what is in the target already, with the same filters so that the excluded files are not touched
+    target_dirs = set()
+    target_files = {}
+    if target.is_dir(target_start):
+        target_dirs.add(target_start.path_comps)
+        dirs, files = target.list_cpaths(target_start, respect_settings=respect_settings, patterns=patterns)
+        target_dirs.update(cpath.path_comps for cpath in dirs)
+        target_files = {cpath.path_comps: cpath for cpath in files}
+    elif target.is_file(target_start):
+        raise PathTreeError(f'Sync target is a file: {target_start.abs_path}')
+
+    for cpath in src_files:
+        if cpath.path_comps in target_dirs:
+            raise PathTreeError(f'Sync target is a directory where the source has a file: {cpath.relative_path}')
+
+    # directories, in batch
+    missing = [cpath.path_comps for cpath in (start, *src_dirs) if cpath.path_comps not in target_dirs]
+    for comps in missing:
+        stale = target_files.pop(comps, None)
+        if stale is not None:
+            # a file where the source has a directory
+            target.fs.remove(stale.abs_path)
+    for comps in _deepest_dirs(missing):
+        target.makedirs(comps)
+
+    # files that differ
+    to_copy = []
+    existing = [(cpath, target_files[cpath.path_comps]) for cpath in src_files if cpath.path_comps in target_files]
+    if existing:
+        src_stats = source.stat_many([pair[0] for pair in existing], workers=workers)
+        dst_stats = target.stat_many([pair[1] for pair in existing], workers=workers)
+        same_size = [(src, dst) for src, dst in existing if src_stats[src].size == dst_stats[dst].size]
+        if compare == COMPARE_HASH:
+            src_digests = source.fingerprint_many([pair[0] for pair in same_size])
+            dst_digests = target.fingerprint_many([pair[1] for pair in same_size])
+            unchanged = {src for src, dst in same_size if src_digests[src] == dst_digests[dst]}
+        else:
+            # copies get the mtime of their source, any other mtime (older ones too: a checkout, a restore) is a change
+            unchanged = {src for src, dst in same_size
+                         if abs(dst_stats[dst].mtime - src_stats[src].mtime) <= MTIME_WINDOW}
+        to_copy.extend(pair for pair in existing if pair[0] not in unchanged)
+    skipped = len(existing) - len(to_copy)
+    to_copy.extend((cpath, target.create_cpath(cpath.path_comps, is_file=True))
+                   for cpath in src_files if cpath.path_comps not in target_files)
+
+    def copy(pair):
+        src, dst = pair
+        # taken before the copy, a change during it is seen as a change on the next sync
+        mtime = src.stat().mtime
+        size = src.copy_to(dst)
+        target.set_mtime(dst, mtime)
+        return size
+
+    if workers is not None and workers > 1 and len(to_copy) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            copied_bytes = sum(executor.map(copy, to_copy))
+    else:
+        copied_bytes = sum(copy(pair) for pair in to_copy)
+
+    deleted = 0
+    if delete:
+        src_comps = {cpath.path_comps for cpath in src_files}
+        for comps, cpath in target_files.items():
+            if comps not in src_comps:
+                target.fs.remove(cpath.abs_path)
+                deleted += 1
+
+    return SyncReport(len(to_copy), copied_bytes, skipped, deleted, len(missing), time.perf_counter() - started)
@@ -0,0 +1,184 @@
+import os
+import shutil
+import tempfile
+import threading
+from PyPathTree.exceptions import PathTreeError
+
+STAGING_PREFIX = '.pypathtree-transaction-'
+
+
+def _deepest_dirs(comps_list):
+    """The deepest ones of the directories (as comps tuples), makedirs() of them creates the others on the way"""
+    leaves = []
+    for comps in sorted(comps_list, reverse=True):
+        # in reverse order a parent comes right after (one of) its deepest children
+        if leaves and leaves[-1][:len(comps)] == comps:
+            continue
+        leaves.append(comps)
+    return leaves[::-1]
+
+
+class Transaction(object):
+    """
+    Writes of a path tree staged in a directory under its root (so on the same file system) until commit().
+    On commit the staged files are fsynced all at once, the directories are made (the deepest ones only) and every file
+    is moved to its place with os.replace(), so no file is ever seen half written. rollback() drops everything.
+    Reads of a staged file see the staged content. Made by PathTree.transaction(), for the real file system backend.
+    """
+    def __init__(self, path_tree, durable=True):
+        self.__path_tree = path_tree
+        self.__durable = durable
+        root = path_tree.host.abs_root_path
+        try:
+            self.__staging_path = tempfile.mkdtemp(prefix=STAGING_PREFIX, dir=root)
+        except (OSError, IOError) as e:
+            raise PathTreeError(
+                f'Synamic File System Error (occurred during making the transaction directory in: {root}):\n'
+                f'{str(e)}'
+            )
+        # abs path -> staged path
+        self.__staged = {}
+        # directories to make on commit
+        self.__dirs = set()
+        # normalized paths of them, of their parents and of the parents of the staged files, up to the root
+        self.__staged_dirs = set()
+        self.__opened = []
+        self.__done = False
+        self.__rollback_only = False
+        self.__lock = threading.Lock()
+
+    @property
+    def staging_path(self):
+        return self.__staging_path
+
+    @property
+    def staging_name(self):
+        """Name of the staging directory in the root, walks leave it out"""
+        return os.path.basename(self.__staging_path)
+
+    @property
+    def rollback_only(self):
+        return self.__rollback_only
+
+    def mark_rollback_only(self):
+        """Makes PathTree.transaction() roll it back instead of committing it when the outermost one exits"""
+        self.__rollback_only = True
+
+    @property
+    def staged(self):
+        """Abs paths of the files written in the transaction"""
+        with self.__lock:
+            return tuple(self.__staged)
+
+    def __add_staged_dirs(self, dir_path):
+        root = os.path.normpath(self.__path_tree.host.abs_root_path)
+        dir_path = os.path.normpath(dir_path)
+        while dir_path not in self.__staged_dirs and dir_path != root and dir_path != os.path.dirname(dir_path):
+            self.__staged_dirs.add(dir_path)
+            dir_path = os.path.dirname(dir_path)
+
+    def is_staged_dir(self, path):
+        """Whether path is a directory made on commit, passed to makedirs() or a parent of a staged path"""
+        with self.__lock:
+            return os.path.normpath(path) in self.__staged_dirs
+
+    def resolve(self, path):
+        """Where the current content of path is: the staged file when it was written in the transaction"""
+        with self.__lock:
+            return self.__staged.get(path, path)
+
+    def open(self, path, mode='r', *args, **kwargs):
+        fs = self.__path_tree.fs
+        assert not self.__done, 'The transaction is over'
+        with self.__lock:
+            staged = self.__staged.get(path, None)
+            if set(mode) & set('wax+') == set():
+                # read only
+                return fs.open(staged or path, mode, *args, **kwargs)
+
+            if staged is None:
+                if fs.is_dir(path):
+                    raise PathTreeError(f'Synamic File System Error (occurred during opening path {path}):\n'
+                                        f'is a directory')
+                if 'x' in mode and fs.exists(path):
+                    raise PathTreeError(f'Synamic File System Error (occurred during opening path {path}):\n'
+                                        f'file exists')
+                new_staged = os.path.join(self.__staging_path, str(len(self.__staged)))
+                if ('a' in mode or 'r' in mode) and fs.is_file(path):
+                    # copy the content that the mode keeps
+                    try:
+                        shutil.copyfile(path, new_staged)
+                    except (OSError, IOError) as e:
+                        raise PathTreeError(
+                            f'Synamic File System Error (occurred during staging path: {path}):\n'
+                            f'{str(e)}'
+                        )
+                fo = fs.open(new_staged, mode, *args, **kwargs)
+                self.__staged[path] = new_staged
+                self.__add_staged_dirs(os.path.dirname(path))
+            else:
+                if 'x' in mode:
+                    raise PathTreeError(f'Synamic File System Error (occurred during opening path {path}):\n'
+                                        f'file exists')
+                fo = fs.open(staged, mode, *args, **kwargs)
+            self.__opened.append(fo)
+        return fo
+
+    def makedirs(self, path):
+        """Made on commit, together with the parents of the staged files"""
+        assert not self.__done, 'The transaction is over'
+        with self.__lock:
+            self.__dirs.add(path)
+            self.__add_staged_dirs(path)
+
+    @staticmethod
+    def __fsync(path, flags=os.O_RDONLY):
+        fd = os.open(path, flags)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def commit(self):
+        """Publishes the staged files, returns their abs paths"""
+        assert not self.__done, 'The transaction is over'
+        with self.__lock:
+            self.__done = True
+            for fo in self.__opened:
+                if not fo.closed:
+                    fo.close()
+            staged = self.__staged
+            try:
+                if self.__durable:
+                    for staged_path in staged.values():
+                        self.__fsync(staged_path)
+                parents = {os.path.dirname(path) for path in staged}
+                dirs = {tuple(os.path.normpath(dir_path).split(os.sep)): dir_path
+                        for dir_path in self.__dirs | parents}
+                for comps in _deepest_dirs(dirs):
+                    os.makedirs(dirs[comps], exist_ok=True)
+                for path, staged_path in staged.items():
+                    os.replace(staged_path, path)
+                if self.__durable and hasattr(os, 'O_DIRECTORY'):
+                    # the renames themselves
+                    for dir_path in parents:
+                        self.__fsync(dir_path, os.O_RDONLY | os.O_DIRECTORY)
+            except (OSError, IOError) as e:
+                raise PathTreeError(
+                    f'Synamic File System Error (occurred during committing transaction: {self.__staging_path}):\n'
+                    f'{str(e)}'
+                )
+            finally:
+                shutil.rmtree(self.__staging_path, ignore_errors=True)
+        return tuple(staged)
+
+    def rollback(self):
+        """Drops the staged files and directories, nothing of the transaction is published"""
+        if self.__done:
+            return
+        with self.__lock:
+            self.__done = True
+            for fo in self.__opened:
+                if not fo.closed:
+                    fo.close()
+            shutil.rmtree(self.__staging_path, ignore_errors=True)
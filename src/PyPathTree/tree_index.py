@@ -0,0 +1,139 @@
+import os
+import gzip
+import json
+import time
+import threading
+from PyPathTree.contracts.fs_backend import FsEntry, FsStat
+
+# data of paths modified this recently is not cached: another change in the same mtime tick would go unnoticed.
+RACY_SECONDS = 2.0
+
+
+def is_racy(mtime):
+    """Whether something with this mtime was modified too recently to cache what is known of it"""
+    return time.time() - mtime <= RACY_SECONDS
+
+
+class _StatFsEntry(FsEntry):
+    """Listing entry with the FsStat of the file it was indexed with"""
+    def __init__(self, name, path, is_file, is_dir, fs_stat):
+        super().__init__(name, path, is_file, is_dir)
+        self.fs_stat = fs_stat
+
+
+class TreeIndex(object):
+    """
+    Persistent cache of the directory listings of a path tree.
+    Every listed directory is stored with its mtime, a later walk lists a directory again only when its mtime changed
+    and reuses the stored entries otherwise. So a warm walk costs one stat per directory plus a listing per changed
+    directory. Changing the content of a file does not change the mtime of its directory, only names and types of
+    the entries are kept here.
+    With with_stats the FsStat of the files is kept too and the reused entries carry it as fs_stat (for du()), sizes
+    of files written into without their directory changing are then stale. Without index_path it is in memory only.
+    """
+    VERSION = 1
+
+    def __init__(self, path_tree, index_path=None, with_stats=False):
+        self.__path_tree = path_tree
+        self.__index_path = index_path
+        self.__with_stats = with_stats
+        # dir abs path -> (mtime, ((name, kind, FsStat of files with stats or None), ...)), kind being 'f' for files,
+        # 'd' for directories and 'o' for anything else (broken links, ...) that is listed all the same
+        # so that a warm walk sees what a cold one sees
+        self.__dirs = {}
+        self.__lock = threading.Lock()
+        self.__reused = 0
+        self.__relisted = 0
+
+    @property
+    def index_path(self):
+        return self.__index_path
+
+    @property
+    def with_stats(self):
+        return self.__with_stats
+
+    @property
+    def stats(self):
+        """Number of directories whose listing was reused and listed again since the last clear()"""
+        return {'reused': self.__reused, 'relisted': self.__relisted, 'dirs': len(self.__dirs)}
+
+    def __root(self):
+        return self.__path_tree.host.abs_root_path
+
+    def load(self):
+        """Loads the index file, returns False when there is none or it is for another root, version or with_stats"""
+        if self.__index_path is None or not os.path.exists(self.__index_path):
+            return False
+        with gzip.open(self.__index_path, 'rt', encoding='utf-8') as fr:
+            data = json.load(fr)
+        if data.get('version') != self.VERSION or data.get('root') != self.__root() or \
+                data.get('with_stats', False) != self.__with_stats:
+            return False
+        dirs = {}
+        for dir_path, (mtime, entries) in data['dirs'].items():
+            dirs[dir_path] = (mtime, tuple(
+                (entry[0], entry[1], FsStat(*entry[2]) if len(entry) > 2 else None) for entry in entries))
+        with self.__lock:
+            self.__dirs = dirs
+        return True
+
+    def save(self):
+        assert self.__index_path is not None, 'An index without index_path cannot be saved'
+        with self.__lock:
+            dirs = {
+                dir_path: [mtime, [[name, kind] + ([list(fs_stat)] if fs_stat else [])
+                                   for name, kind, fs_stat in entries]]
+                for dir_path, (mtime, entries) in self.__dirs.items()
+            }
+        data = {'version': self.VERSION, 'root': self.__root(), 'dirs': dirs}
+        if self.__with_stats:
+            data['with_stats'] = True
+        tmp_path = self.__index_path + '.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as fw:
+            json.dump(data, fw, separators=(',', ':'))
+        os.replace(tmp_path, self.__index_path)
+
+    def clear(self):
+        with self.__lock:
+            self.__dirs = {}
+            self.__reused = 0
+            self.__relisted = 0
+
+    def scandir(self, path):
+        """Same as the scandir of the backend, from the index when the directory did not change"""
+        fs = self.__path_tree.fs
+        mtime = fs.getmtime(path)
+        base = path.rstrip('/\\')
+        with self.__lock:
+            cached = self.__dirs.get(path, None)
+            if cached is not None and cached[0] == mtime:
+                self.__reused += 1
+                if self.__with_stats:
+                    return [_StatFsEntry(name, base + '/' + name, kind == 'f', kind == 'd', fs_stat)
+                            for name, kind, fs_stat in cached[1]]
+                return [FsEntry(name, base + '/' + name, kind == 'f', kind == 'd') for name, kind, _ in cached[1]]
+
+        listed = fs.scandir(path)
+        entries = []
+        for entry in listed:
+            if entry.is_file():
+                entries.append((entry.name, 'f', fs.stat_entry(entry) if self.__with_stats else None))
+            else:
+                entries.append((entry.name, 'd' if entry.is_dir() else 'o', None))
+
+        with self.__lock:
+            self.__relisted += 1
+            if cached is not None:
+                # forget the directories that are gone
+                gone = {name for name, kind, _ in cached[1] if kind == 'd'} - \
+                       {name for name, kind, _ in entries if kind == 'd'}
+                for name in gone:
+                    prefix = base + '/' + name
+                    for dir_path in [p for p in self.__dirs if p == prefix or p.startswith(prefix + '/')]:
+                        del self.__dirs[dir_path]
+            if not is_racy(mtime):
+                self.__dirs[path] = (mtime, tuple(entries))
+            else:
+                self.__dirs.pop(path, None)
+        return listed
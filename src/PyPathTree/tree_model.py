@@ -0,0 +1,264 @@
+import threading
+from collections import deque
+from PyPathTree.exceptions import PathTreeError
+from PyPathTree._cpath import _extension
+
+
+class _ModelNode:
+    """A file (children is None) or a directory of the model. Directories count the extensions of all the files under
+    them so that extension queries only go into the subtrees that have such files."""
+    __slots__ = ('children', 'stat', 'ext_counts')
+
+    def __init__(self, stat, is_file):
+        self.stat = stat
+        self.children = None if is_file else {}
+        self.ext_counts = None if is_file else {}
+
+    @property
+    def is_file(self):
+        return self.children is None
+
+    def contribution(self, name):
+        """Extension counts this node adds to its parents"""
+        if self.children is None:
+            return {_extension(name): 1}
+        return self.ext_counts
+
+
+class TreeModel(object):
+    """
+    In memory trie of the path components of a loaded path tree, every node keeps the FsStat of its path.
+    Queries are answered from the trie without touching the backend, in the cost of the depth of the path plus the
+    results. The model only changes on refresh(), invalidate() marks paths to be refreshed before the next query
+    (e.g. the cpaths of the events of a watcher). With respect_settings the files and directories that the walks leave
+    out (ignore_files_sw/ignore_dirs_sw of the host) are left out of it, and ignored directories are not scanned.
+    """
+    def __init__(self, path_tree, respect_settings=True):
+        self.__path_tree = path_tree
+        self.__respect_settings = respect_settings
+        # default configs, as the walker reads them
+        _dc = path_tree.host.system_settings['configs']
+        self.__ignore_dirs_sw = tuple(_dc.get('ignore_dirs_sw', tuple()))
+        self.__ignore_files_sw = tuple(_dc.get('ignore_files_sw', tuple()))
+        self.__root = None
+        # root relative comps to refresh before the next query
+        self.__pending = set()
+        self.__lock = threading.RLock()
+
+    @property
+    def path_tree(self):
+        return self.__path_tree
+
+    @property
+    def respect_settings(self):
+        return self.__respect_settings
+
+    def __is_ignored(self, name, is_file):
+        if not self.__respect_settings:
+            return False
+        return name.startswith(self.__ignore_files_sw if is_file else self.__ignore_dirs_sw)
+
+    def __comps(self, path):
+        comps = self.__path_tree.to_path_comps(*path)
+        return () if comps == ('', ) else comps
+
+    def __scan(self, abs_path, stat):
+        """A directory node of abs_path with everything under it"""
+        fs = self.__path_tree.fs
+        node = _ModelNode(stat, is_file=False)
+        dirs = []
+        to_scan = deque([(node, abs_path)])
+        while len(to_scan) != 0:
+            dir_node, dir_abs = to_scan.popleft()
+            dirs.append(dir_node)
+            for entry in fs.scandir(dir_abs):
+                is_file = entry.is_file()
+                if not is_file and not entry.is_dir():
+                    continue
+                if self.__is_ignored(entry.name, is_file):
+                    continue
+                child = _ModelNode(fs.stat_entry(entry), is_file)
+                dir_node.children[entry.name] = child
+                if not is_file:
+                    to_scan.append((child, entry.path))
+
+        # breadth first order reversed: children are counted before their parents
+        for dir_node in reversed(dirs):
+            counts = dir_node.ext_counts
+            for name, child in dir_node.children.items():
+                for ext, count in child.contribution(name).items():
+                    counts[ext] = counts.get(ext, 0) + count
+        return node
+
+    def build(self, respect_settings=None):
+        """Scans the whole tree into the model, respect_settings other than None replaces the one it was made with"""
+        if respect_settings is not None:
+            self.__respect_settings = respect_settings
+        path_tree = self.__path_tree
+        root_abs = path_tree.host.abs_root_path
+        fs = path_tree.fs
+        if not fs.is_dir(root_abs):
+            raise PathTreeError(f'Root of the path tree must be a directory to load it: {root_abs}')
+        root = self.__scan(root_abs, fs.stat(root_abs))
+        with self.__lock:
+            self.__root = root
+            self.__pending.clear()
+
+    def invalidate(self, *path):
+        """Marks the path (the whole tree when none is given) to be refreshed before the next query"""
+        comps = self.__comps(path)
+        with self.__lock:
+            self.__pending.add(comps)
+
+    def refresh(self, *path):
+        """Scans the path again (the whole tree when none is given), it is removed from the model when it is gone"""
+        comps = self.__comps(path)
+        with self.__lock:
+            self.__refresh(comps)
+
+    def __apply_pending(self):
+        if len(self.__pending) == 0:
+            return
+        pending = sorted(self.__pending, key=len)
+        self.__pending.clear()
+        done = []
+        for comps in pending:
+            # a refreshed parent covers it
+            if any(comps[:len(parent)] == parent for parent in done):
+                continue
+            self.__refresh(comps)
+            done.append(comps)
+
+    def __refresh(self, comps):
+        if len(comps) == 0:
+            self.build()
+            return
+        fs = self.__path_tree.fs
+
+        # the deepest existing node on the way, nodes that were not there are scanned from the first missing one
+        ancestors = [self.__root]
+        node = self.__root
+        for idx, comp in enumerate(comps[:-1]):
+            child = node.children.get(comp, None)
+            if child is None or child.is_file:
+                comps = comps[:idx + 1]
+                break
+            ancestors.append(child)
+            node = child
+        parent = ancestors[-1]
+        name = comps[-1]
+
+        old = parent.children.pop(name, None)
+        if old is not None:
+            self.__add_counts(ancestors, old.contribution(name), -1)
+
+        abs_path = self.__path_tree.get_full_path(comps)
+        if any(self.__is_ignored(comp, False) for comp in comps[:-1]):
+            # under an ignored directory, that is never in the model
+            new = None
+        elif fs.is_file(abs_path) and not self.__is_ignored(name, True):
+            new = _ModelNode(fs.stat(abs_path), is_file=True)
+        elif fs.is_dir(abs_path) and not self.__is_ignored(name, False):
+            new = self.__scan(abs_path, fs.stat(abs_path))
+        else:
+            new = None
+        if new is not None:
+            parent.children[name] = new
+            self.__add_counts(ancestors, new.contribution(name), 1)
+
+        # an entry of the parent was created or removed
+        if new is None or old is None:
+            parent_abs = self.__path_tree.get_full_path(comps[:-1] or ('', ))
+            if fs.is_dir(parent_abs):
+                parent.stat = fs.stat(parent_abs)
+
+    @staticmethod
+    def __add_counts(ancestors, counts, sign):
+        for ancestor in ancestors:
+            ext_counts = ancestor.ext_counts
+            for ext, count in counts.items():
+                new_count = ext_counts.get(ext, 0) + sign * count
+                if new_count:
+                    ext_counts[ext] = new_count
+                else:
+                    del ext_counts[ext]
+
+    def __node(self, comps):
+        self.__apply_pending()
+        node = self.__root
+        for comp in comps:
+            if node.children is None:
+                return None
+            node = node.children.get(comp, None)
+            if node is None:
+                return None
+        return node
+
+    def __dir_node(self, comps):
+        node = self.__node(comps)
+        if node is None or node.is_file:
+            raise PathTreeError(f'Not a directory in the loaded tree: {"/".join(comps)}')
+        return node
+
+    def exists(self, *path) -> bool:
+        with self.__lock:
+            return self.__node(self.__comps(path)) is not None
+
+    def is_file(self, *path) -> bool:
+        with self.__lock:
+            node = self.__node(self.__comps(path))
+            return node is not None and node.is_file
+
+    def is_dir(self, *path) -> bool:
+        with self.__lock:
+            node = self.__node(self.__comps(path))
+            return node is not None and not node.is_file
+
+    def stat(self, *path):
+        """FsStat of the path as it was when it was scanned, None when it is not in the model"""
+        with self.__lock:
+            node = self.__node(self.__comps(path))
+            return None if node is None else node.stat
+
+    def extension_counts(self, *path):
+        """Extension -> number of files under the directory"""
+        with self.__lock:
+            return dict(self.__dir_node(self.__comps(path)).ext_counts)
+
+    def children(self, *path):
+        """Cpaths of the entries of the directory"""
+        comps = self.__comps(path)
+        create_cpath = self.__path_tree.create_cpath
+        with self.__lock:
+            items = [(name, child.is_file) for name, child in self.__dir_node(comps).children.items()]
+        return [create_cpath((*comps, name), is_file=is_file) for name, is_file in items]
+
+    def __under(self, comps, files, dirs, extension):
+        if extension is not None:
+            extension = extension[1:] if extension.startswith('.') else extension
+        found = []
+        with self.__lock:
+            to_travel = deque([(comps, self.__dir_node(comps))])
+            while len(to_travel) != 0:
+                dir_comps, node = to_travel.popleft()
+                for name, child in node.children.items():
+                    child_comps = (*dir_comps, name)
+                    if child.is_file:
+                        if files and (extension is None or _extension(name) == extension):
+                            found.append((child_comps, True))
+                    else:
+                        if dirs:
+                            found.append((child_comps, False))
+                        if extension is None or child.ext_counts.get(extension, 0) > 0:
+                            to_travel.append((child_comps, child))
+        create_cpath = self.__path_tree.create_cpath
+        return [create_cpath(child_comps, is_file=is_file) for child_comps, is_file in found]
+
+    def list_files(self, *path, extension=None):
+        """Cpaths of all the files under the directory, only the ones with the extension ('md' or '.md') when it is
+        given. Only subtrees that have such files are travelled."""
+        return self.__under(self.__comps(path), True, False, extension)
+
+    def list_dirs(self, *path):
+        """Cpaths of all the directories under the directory"""
+        return self.__under(self.__comps(path), False, True, None)
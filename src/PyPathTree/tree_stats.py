@@ -0,0 +1,39 @@
+from collections import namedtuple
+from PyPathTree.tree_index import _StatFsEntry
+
+
+class TreeStats(namedtuple('TreeStats', ('files', 'dirs', 'bytes', 'extensions'))):
+    """Totals of a subtree: number of files and directories under it, bytes of the files and files per extension"""
+    __slots__ = ()
+
+
+def disk_usage(path_tree, loop, start_comps, depth):
+    """Totals of the start directory and of the directories at most depth levels under it from one walk of loop,
+    see PathTree.du()"""
+    stat_entry = path_tree.fs.stat_entry
+    base_len = len(start_comps)
+    # comps -> [files, dirs, bytes, extensions]
+    totals = {start_comps: [0, 0, 0, {}]}
+    for cpath, entry in loop.iter_entries():
+        comps = cpath.path_comps
+        # levels of the directories above it that are reported
+        levels = min(len(comps) - base_len - 1, depth)
+        if cpath.is_file:
+            fs_stat = entry.fs_stat if type(entry) is _StatFsEntry else stat_entry(entry)
+            ext = cpath.extension
+            for level in range(levels + 1):
+                total = totals[comps[:base_len + level]]
+                total[0] += 1
+                total[2] += fs_stat.size
+                total[3][ext] = total[3].get(ext, 0) + 1
+        else:
+            if len(comps) - base_len <= depth:
+                totals[comps] = [0, 0, 0, {}]
+            for level in range(levels + 1):
+                totals[comps[:base_len + level]][1] += 1
+
+    create_cpath = path_tree.create_cpath
+    return {
+        create_cpath(comps or ('', ), is_file=False): TreeStats(files, dirs, size, extensions)
+        for comps, (files, dirs, size, extensions) in totals.items()
+    }
@@ -0,0 +1,351 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict, namedtuple
+from PyPathTree.backends import FileSystemBackend
+
+CREATED = 'created'
+MODIFIED = 'modified'
+DELETED = 'deleted'
+MOVED = 'moved'
+# events were lost (the kernel queue overflowed), the consumer should rescan
+OVERFLOW = 'overflow'
+
+WatchEvent = namedtuple('WatchEvent', ('kind', 'cpath', 'src_cpath'))
+WatchEvent.__new__.__defaults__ = (None, )
+
+# raw events of the sources: (kind, comps, is_dir, src_comps)
+_RawEvent = namedtuple('_RawEvent', ('kind', 'comps', 'is_dir', 'src_comps'))
+
+# from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class _Source(metaclass=ABCMeta):
+    def __init__(self, path_tree, start_comps, respect_settings):
+        self.path_tree = path_tree
+        self.start_comps = start_comps
+        self.respect_settings = respect_settings
+        _dc = path_tree.host.system_settings['configs']
+        self.ignore_dirs_sw = tuple(_dc.get('ignore_dirs_sw', tuple()))
+        self.ignore_files_sw = tuple(_dc.get('ignore_files_sw', tuple()))
+
+    def is_ignored(self, name, is_dir):
+        if not self.respect_settings:
+            return False
+        return name.startswith(self.ignore_dirs_sw if is_dir else self.ignore_files_sw)
+
+    def iter_tree(self, comps):
+        """(comps, is_dir) of everything under comps that a walk would list"""
+        for cpath in self.path_tree.iter_cpaths(comps, respect_settings=self.respect_settings):
+            yield cpath.path_comps, cpath.is_dir
+
+    @abstractmethod
+    def read(self, timeout):
+        pass
+
+    def close(self):
+        pass
+
+
+class _InotifySource(_Source):
+    def __init__(self, path_tree, start_comps, respect_settings, libc):
+        super().__init__(path_tree, start_comps, respect_settings)
+        self.__libc = libc
+        self.__fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.__fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+        # watch descriptor -> comps of the watched directory
+        self.__wds = {}
+        self.__add_tree(start_comps)
+
+    def __add_watch(self, comps):
+        path = os.fsencode(self.path_tree.get_full_path(comps))
+        wd = self.__libc.inotify_add_watch(self.__fd, path, _WATCH_MASK)
+        if wd < 0:
+            e = ctypes.get_errno()
+            if e in (errno.ENOENT, errno.ENOTDIR):
+                # gone before it could be watched
+                return
+            raise OSError(e, os.strerror(e))
+        self.__wds[wd] = comps
+
+    def __add_tree(self, comps, events=None):
+        self.__add_watch(comps)
+        for sub_comps, is_dir in self.iter_tree(comps):
+            if is_dir:
+                self.__add_watch(sub_comps)
+            if events is not None:
+                # could be created before the watch was there
+                events.append(_RawEvent(CREATED, sub_comps, is_dir, None))
+
+    def __rename_tree(self, src_comps, dst_comps):
+        n = len(src_comps)
+        for wd, comps in self.__wds.items():
+            if comps[:n] == src_comps:
+                self.__wds[wd] = (*dst_comps, *comps[n:])
+
+    def __remove_tree(self, comps):
+        n = len(comps)
+        for wd in [wd for wd, c in self.__wds.items() if c[:n] == comps]:
+            self.__libc.inotify_rm_watch(self.__fd, wd)
+            del self.__wds[wd]
+
+    def read(self, timeout):
+        readable, _, _ = select.select([self.__fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            buf = os.read(self.__fd, 65536)
+        except BlockingIOError:
+            return []
+
+        events = []
+        moved_from = OrderedDict()
+        offset = 0
+        while offset < len(buf):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(buf[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                events.append(_RawEvent(OVERFLOW, self.start_comps, True, None))
+                continue
+            if mask & IN_IGNORED:
+                self.__wds.pop(wd, None)
+                continue
+            dir_comps = self.__wds.get(wd, None)
+            if dir_comps is None or not name:
+                continue
+            is_dir = bool(mask & IN_ISDIR)
+            if self.is_ignored(name, is_dir):
+                continue
+            comps = (*dir_comps, name)
+
+            if mask & IN_CREATE:
+                events.append(_RawEvent(CREATED, comps, is_dir, None))
+                if is_dir:
+                    self.__add_tree(comps, events)
+            elif mask & IN_DELETE:
+                events.append(_RawEvent(DELETED, comps, is_dir, None))
+            elif mask & IN_MOVED_FROM:
+                moved_from[cookie] = (comps, is_dir)
+            elif mask & IN_MOVED_TO:
+                src = moved_from.pop(cookie, None)
+                if src is not None:
+                    events.append(_RawEvent(MOVED, comps, is_dir, src[0]))
+                    if is_dir:
+                        self.__rename_tree(src[0], comps)
+                else:
+                    # moved in from outside of the tree
+                    events.append(_RawEvent(CREATED, comps, is_dir, None))
+                    if is_dir:
+                        self.__add_tree(comps, events)
+            elif mask & (IN_MODIFY | IN_CLOSE_WRITE):
+                events.append(_RawEvent(MODIFIED, comps, is_dir, None))
+
+        # moved out of the tree
+        for comps, is_dir in moved_from.values():
+            events.append(_RawEvent(DELETED, comps, is_dir, None))
+            if is_dir:
+                self.__remove_tree(comps)
+        return events
+
+    def close(self):
+        if self.__fd >= 0:
+            os.close(self.__fd)
+            self.__fd = -1
+
+
+class _PollingSource(_Source):
+    """Walks the tree every interval and compares getmtime() of the files, moves are seen as delete + create"""
+    def __init__(self, path_tree, start_comps, respect_settings, interval):
+        super().__init__(path_tree, start_comps, respect_settings)
+        self.__interval = interval
+        self.__snapshot = self.__take_snapshot()
+        self.__next_poll = time.monotonic() + interval
+
+    def __take_snapshot(self):
+        snapshot = {}
+        for cpath in self.path_tree.iter_cpaths(self.start_comps, respect_settings=self.respect_settings):
+            try:
+                snapshot[cpath.path_comps] = (cpath.is_dir, None if cpath.is_dir else cpath.getmtime())
+            except Exception:
+                # removed while walking
+                continue
+        return snapshot
+
+    def read(self, timeout):
+        wait = self.__next_poll - time.monotonic()
+        if timeout is not None and wait > timeout:
+            time.sleep(timeout)
+            return []
+        if wait > 0:
+            time.sleep(wait)
+        self.__next_poll = time.monotonic() + self.__interval
+
+        old, new = self.__snapshot, self.__take_snapshot()
+        self.__snapshot = new
+        events = []
+        for comps, (is_dir, mtime) in new.items():
+            if comps not in old:
+                events.append(_RawEvent(CREATED, comps, is_dir, None))
+            elif old[comps] != (is_dir, mtime):
+                events.append(_RawEvent(MODIFIED if old[comps][0] == is_dir else CREATED, comps, is_dir, None))
+        for comps, (is_dir, mtime) in old.items():
+            if comps not in new:
+                events.append(_RawEvent(DELETED, comps, is_dir, None))
+        return events
+
+
+class _Coalescer:
+    """Folds the raw events of a burst into the net change per path"""
+    # (previous kind, new kind) -> folded kind, None drops the path
+    _FOLD = {
+        (CREATED, MODIFIED): CREATED,
+        (CREATED, DELETED): None,
+        (MODIFIED, DELETED): DELETED,
+        (DELETED, CREATED): MODIFIED,
+        (DELETED, MODIFIED): MODIFIED,
+    }
+
+    def __init__(self):
+        self.__events = OrderedDict()
+
+    def add(self, event):
+        if event.kind in (MOVED, OVERFLOW):
+            self.__events[(event.kind, event.src_comps, event.comps)] = event
+            return
+        key = (event.comps, event.is_dir)
+        previous = self.__events.pop(key, None)
+        if previous is not None:
+            kind = self._FOLD.get((previous.kind, event.kind), event.kind)
+            if kind is None:
+                return
+            event = event._replace(kind=kind)
+        self.__events[key] = event
+
+    def pop_all(self):
+        events = list(self.__events.values())
+        self.__events.clear()
+        return events
+
+
+class PathTreeWatcher(object):
+    """
+    Watches a path tree (or a directory of it) and reports created/modified/deleted/moved paths as WatchEvent objects
+    with cpaths. Uses inotify on Linux when the tree is on the real file system and polls with getmtime() otherwise.
+    Bursts of changes are debounced: poll() returns once no new change arrived for `debounce` seconds, with the
+    changes of every path folded together. Paths that never stop changing (logs, build outputs) do not hold it back
+    longer than `max_latency` seconds after the first change, nor past its timeout.
+    """
+    def __init__(self, path_tree, initial_path_comps=(), debounce=0.05, respect_settings=True, polling=None,
+                 poll_interval=1.0, max_latency=1.0):
+        self.__path_tree = path_tree
+        self.__debounce = debounce
+        self.__max_latency = max_latency
+        if path_tree.is_type_cpath(initial_path_comps):
+            assert initial_path_comps.is_dir
+            start_comps = initial_path_comps.path_comps
+        else:
+            start_comps = path_tree.to_path_comps(initial_path_comps)
+        if start_comps == ('', ):
+            start_comps = ()
+
+        libc = None
+        if not polling and type(path_tree.fs) is FileSystemBackend:
+            libc = _load_libc()
+        assert not (polling is False and libc is None), "inotify is not available for this tree"
+        if libc is not None:
+            self.__source = _InotifySource(path_tree, start_comps, respect_settings, libc)
+        else:
+            self.__source = _PollingSource(path_tree, start_comps, respect_settings, poll_interval)
+        self.__coalescer = _Coalescer()
+        self.__closed = False
+
+    @property
+    def uses_inotify(self):
+        return isinstance(self.__source, _InotifySource)
+
+    def __to_event(self, raw):
+        create = self.__path_tree.create_cpath
+        cpath = create(raw.comps, is_file=not raw.is_dir)
+        src_cpath = None if raw.src_comps is None else create(raw.src_comps, is_file=not raw.is_dir)
+        return WatchEvent(raw.kind, cpath, src_cpath)
+
+    def poll(self, timeout=None):
+        """Waits up to timeout seconds (forever for None) for changes and returns the debounced events, the ones folded
+        so far when the timeout or max_latency is reached while debouncing"""
+        return self.__poll(timeout, debounce_until_timeout=True)
+
+    def __poll(self, timeout, debounce_until_timeout):
+        assert not self.__closed, "Watcher is closed"
+        deadline = None if timeout is None else time.monotonic() + timeout
+        raw_events = []
+        while not raw_events:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return []
+            raw_events = self.__source.read(remaining)
+        debounce_deadline = time.monotonic() + self.__max_latency
+        if deadline is not None and debounce_until_timeout:
+            debounce_deadline = min(debounce_deadline, deadline)
+        while raw_events:
+            for raw in raw_events:
+                self.__coalescer.add(raw)
+            remaining = debounce_deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            raw_events = self.__source.read(min(self.__debounce, remaining))
+        return [self.__to_event(raw) for raw in self.__coalescer.pop_all()]
+
+    def __iter__(self):
+        """Yields lists of debounced events until closed"""
+        while not self.__closed:
+            # the timeout only makes it look at closed now and then, a burst is debounced up to max_latency
+            events = self.__poll(self.__debounce, debounce_until_timeout=False)
+            if events:
+                yield events
+
+    def close(self):
+        if not self.__closed:
+            self.__closed = True
+            self.__source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()